@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Check that `watermark.fingerprint()` stays cheap enough to call on every
+kernel start.
+
+A temporary site directory with --dists fake distributions is put in
+front of sys.path. The benchmark times a cold start without any cache,
+a new kernel that finds a valid on-disk cache, and repeated calls in a
+running process. It exits with a non-zero status if the new-kernel case
+exceeds --target-ms:
+
+    python benchmarks/bench_fingerprint.py [--dists 500] [--target-ms 50]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from watermark import distributions, fingerprint
+
+
+def make_site(root, n_dists):
+    for i in range(n_dists):
+        name = f"bench_dist_{i:04d}"
+        info = os.path.join(root, f"{name}-1.{i}.0.dist-info")
+        os.mkdir(info)
+        with open(os.path.join(info, "METADATA"), "w") as f:
+            f.write(f"Metadata-Version: 2.1\nName: {name}\n"
+                    f"Version: 1.{i}.0\n")
+        with open(os.path.join(info, "top_level.txt"), "w") as f:
+            f.write(f"{name}\n")
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dists", type=int, default=500)
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    parser.add_argument("-n", "--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as site, \
+            tempfile.TemporaryDirectory() as cache:
+        make_site(site, args.dists)
+        sys.path.insert(0, site)
+        os.environ["WATERMARK_CACHE_DIR"] = cache
+
+        def no_cache():
+            os.environ["WATERMARK_NO_CACHE"] = "1"
+            distributions.clear_cache()
+            fingerprint()
+            del os.environ["WATERMARK_NO_CACHE"]
+
+        def new_kernel():
+            distributions.clear_cache()
+            fingerprint()
+
+        fingerprint()  # write the on-disk cache
+        total = len(distributions.get_index())
+        results = [
+            ("cold (metadata scan)", measure(no_cache, args.repeat)),
+            ("new kernel (disk cache)", measure(new_kernel, args.repeat)),
+            ("running kernel", measure(fingerprint, args.repeat)),
+        ]
+
+    print(f"{total} distributions, median of {args.repeat} runs")
+    for label, ms in results:
+        print(f"  {label:<26}{ms:>9.2f} ms")
+    if results[1][1] > args.target_ms:
+        print(f"new kernel fingerprint exceeds {args.target_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
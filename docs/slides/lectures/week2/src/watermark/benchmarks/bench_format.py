@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the output formatters on a large `-iv` style section.
+
+    python benchmarks/bench_format.py [--modules 5000] [-n 20]
+"""
+
+import argparse
+import json
+import timeit
+
+from watermark.watermark import _format_output
+
+
+def concat_formatted_text(list_of_dicts):
+    """The previous `+=` based text formatter, kept for comparison"""
+    result = []
+    for section in list_of_dicts:
+        if section:
+            text = ""
+            longest = max(len(key) for key in section)
+            for key, value in section.items():
+                text += f"{key.ljust(longest)}: {value}\n"
+            result.append(text)
+    return "\n".join(result)
+
+
+def make_sections(n_modules):
+    iversions = {f"package_{i:05d}": f"{i % 7}.{i % 13}.{i % 5}"
+                 for i in range(n_modules)}
+    return [
+        ("updated", {"Last updated": "2021-08-10T00:00:00+00:00"}),
+        ("python", {"Python implementation": "CPython",
+                    "Python version": "3.9.6",
+                    "IPython version": "7.25.0"}),
+        ("iversions", iversions),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", type=int, default=5000)
+    parser.add_argument("-n", "--number", type=int, default=20)
+    args = parser.parse_args()
+
+    sections = make_sections(args.modules)
+    assert _format_output(sections, "text") == \
+        concat_formatted_text([section for _, section in sections])
+    cases = [
+        ("text (+=)",
+         lambda: concat_formatted_text([s for _, s in sections])),
+        ("text (join)", lambda: _format_output(sections, "text")),
+        ("dict", lambda: _format_output(sections, "dict")),
+        ("json", lambda: _format_output(sections, "json")),
+        ("json round trip",
+         lambda: json.loads(_format_output(sections, "json"))),
+    ]
+    print(f"{args.modules} modules, best of 5 x {args.number} calls")
+    for label, func in cases:
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(f"  {label:<18}{best / args.number * 1e3:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
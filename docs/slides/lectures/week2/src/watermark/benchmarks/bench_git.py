@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the native Git reader against the `git` subprocess fallback.
+
+Run from inside a Git checkout:
+
+    python benchmarks/bench_git.py [-n 50]
+"""
+
+import argparse
+import timeit
+
+from watermark import gitinfo
+from watermark.watermark import _run_git
+
+
+PROBES = [
+    ("hash", gitinfo.head_commit, ["rev-parse", "HEAD"]),
+    ("branch", gitinfo.head_branch, ["rev-parse", "--abbrev-ref", "HEAD"]),
+    ("remote", gitinfo.remote_url,
+     ["config", "--get", "remote.origin.url"]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'probe':<8}{'native (ms)':>14}{'subprocess (ms)':>18}"
+          f"{'speedup':>10}")
+    for name, native, git_args in PROBES:
+        assert native() == _run_git(git_args), name
+        t_native = timeit.timeit(native, number=args.number) / args.number
+        t_proc = timeit.timeit(lambda: _run_git(git_args),
+                               number=args.number) / args.number
+        print(f"{name:<8}{t_native * 1e3:>14.3f}{t_proc * 1e3:>18.3f}"
+              f"{t_proc / t_native:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the cost of `import watermark` with `python -X importtime`.
+
+Exits with a non-zero status if a module that should be imported lazily
+shows up, or if the median cumulative import time exceeds --max-ms:
+
+    python benchmarks/bench_import.py [-n 10] [--max-ms 50]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Modules that `import watermark` must not pull in
+LAZY_MODULES = ("IPython", "importlib.metadata", "subprocess",
+                "concurrent.futures", "multiprocessing")
+
+
+def importtime(statement="import watermark"):
+    """Return `{module: (self_us, cumulative_us)}` for one fresh process"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [root, env.get("PYTHONPATH")]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                           statement], env=env, check=True,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        timings[module.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [importtime() for _ in range(args.number)]
+    totals = [run["watermark"][1] / 1e3 for run in runs]
+    median = statistics.median(totals)
+    print(f"import watermark: median {median:.1f} ms, "
+          f"min {min(totals):.1f} ms over {args.number} runs")
+
+    last = runs[-1]
+    print("slowest dependencies (cumulative ms):")
+    for module, (_, cumulative) in sorted(
+            last.items(), key=lambda item: -item[1][1])[1:11]:
+        print(f"  {module:<40}{cumulative / 1e3:>8.1f}")
+
+    failed = False
+    leaked = [m for m in LAZY_MODULES if m in last]
+    if leaked:
+        print("eagerly imported: " + ", ".join(leaked))
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"median import time exceeds {args.max_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Time `watermark()` cold and warm for each flag, `-iv`, `-p` and the Git
+probes against self-contained fixtures, and write the results as JSON.
+
+The fixtures are built in a temporary directory: a Git repository with
+--refs packed refs and a fake site-packages directory with --packages
+dist-info entries, which is put first on `sys.path`. "cold" runs start
+from empty in-process and on-disk caches, "warm" runs repeat a call.
+
+    python benchmarks/bench_suite.py [-n 20] [-o results.json]
+    python benchmarks/bench_suite.py --compare old.json [--tolerance 1.5]
+
+With --compare, cases that got slower than --tolerance times the
+baseline median are listed and the exit status is 1.
+"""
+
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import watermark
+from watermark import distributions, gitindex
+
+wm = sys.modules["watermark.watermark"]
+
+
+# Flags benchmarked alone, all together and, with --all-combinations,
+# in every combination
+FLAGS = ("python", "machine", "hostname", "githash", "gitrepo",
+         "gitbranch", "watermark")
+
+
+def git(cwd, *args):
+    subprocess.run(["git"] + list(args), cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_git_repo(root, n_refs):
+    """Create a repository with one commit and `n_refs` packed tags"""
+    path = os.path.join(root, "repo")
+    os.makedirs(path)
+    git(path, "init", "-q", "-b", "main")
+    git(path, "config", "user.name", "watermark")
+    git(path, "config", "user.email", "watermark@example.com")
+    git(path, "remote", "add", "origin", "https://example.com/repo.git")
+    for i in range(20):
+        with open(os.path.join(path, f"file{i}.txt"), "w") as f:
+            f.write(f"{i}\n")
+    git(path, "add", ".")
+    git(path, "commit", "-q", "-m", "initial")
+    git(path, "pack-refs", "--all")
+
+    head = wm._run_git(["-C", path, "rev-parse", "HEAD"])
+    packed = os.path.join(path, ".git", "packed-refs")
+    with open(packed, "r") as f:
+        lines = f.read().splitlines()
+    lines.extend(f"{head} refs/tags/bench-{i:05d}" for i in range(n_refs))
+    header = lines[0] if lines[0].startswith("#") else "# pack-refs with:"
+    refs = sorted(set(line for line in lines if not line.startswith("#")),
+                  key=lambda line: line.split(" ", 1)[1])
+    with open(packed, "w") as f:
+        f.write("\n".join([header] + refs) + "\n")
+    return path
+
+
+def make_site_packages(root, n_packages):
+    """Create `n_packages` importable packages with dist-info metadata"""
+    site = os.path.join(root, "site-packages")
+    names = [f"wmbench_pkg{i:03d}" for i in range(n_packages)]
+    for i, name in enumerate(names):
+        version = f"1.{i}.0"
+        os.makedirs(os.path.join(site, name))
+        with open(os.path.join(site, name, "__init__.py"), "w") as f:
+            f.write(f"__version__ = {version!r}\n")
+        dist_info = os.path.join(site, f"{name}-{version}.dist-info")
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, "METADATA"), "w") as f:
+            f.write(f"Metadata-Version: 2.1\nName: {name}\n"
+                    f"Version: {version}\n")
+        with open(os.path.join(dist_info, "top_level.txt"), "w") as f:
+            f.write(name + "\n")
+    return site, names
+
+
+@contextlib.contextmanager
+def fixtures(n_refs, n_packages):
+    root = tempfile.mkdtemp(prefix="watermark-bench-")
+    saved = (os.getcwd(), list(sys.path), dict(os.environ))
+    try:
+        repo = make_git_repo(root, n_refs)
+        site, names = make_site_packages(root, n_packages)
+        sys.path.insert(0, site)
+        os.environ["WATERMARK_CACHE_DIR"] = os.path.join(root, "cache")
+        os.chdir(repo)
+        yield repo, names
+    finally:
+        os.chdir(saved[0])
+        sys.path[:] = saved[1]
+        os.environ.clear()
+        os.environ.update(saved[2])
+        watermark.refresh()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def make_cold():
+    """Drop every in-process and on-disk cache"""
+    watermark.refresh()
+    gitindex._index_cache.clear()
+    gitindex._blob_cache.clear()
+    gitindex._pack_index_cache.clear()
+    cache_file = distributions._cache_file()
+    if cache_file and os.path.exists(cache_file):
+        os.remove(cache_file)
+
+
+def measure(func, number, cold):
+    times = []
+    for _ in range(number):
+        if cold:
+            make_cold()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1e3)
+    return {"min_ms": min(times), "median_ms": statistics.median(times),
+            "mean_ms": statistics.mean(times), "runs": number}
+
+
+def cases(names, n_iversions, n_packages, all_combinations):
+    if all_combinations:
+        combos = [combo for size in range(1, len(FLAGS) + 1)
+                  for combo in itertools.combinations(FLAGS, size)]
+    else:
+        combos = [(flag,) for flag in FLAGS] + [FLAGS]
+    yield "default", lambda: watermark.watermark()
+    for combo in combos:
+        kwargs = dict.fromkeys(combo, True)
+        name = "+".join(combo) if combo != FLAGS else "all"
+        yield name, lambda kwargs=kwargs: watermark.watermark(**kwargs)
+
+    packages = ",".join(names[:n_packages])
+    yield (f"packages-{n_packages}",
+           lambda: watermark.watermark(packages=packages))
+
+    modules = [__import__(name) for name in names[:n_iversions]]
+    user_ns = {module.__name__: module for module in modules}
+    fake_self = types.SimpleNamespace(
+        shell=types.SimpleNamespace(user_ns=user_ns))
+    yield (f"iversions-{n_iversions}",
+           lambda: watermark.watermark(iversions=True,
+                                       watermark_self=fake_self))
+
+
+def run(args):
+    results = {}
+    with fixtures(args.refs, max(args.iversions, args.packages)) as \
+            (repo, names):
+        # Import the probe modules once so that "cold" measures empty
+        # caches rather than first imports
+        watermark.watermark(**dict.fromkeys(FLAGS, True))
+        for name, func in cases(names, args.iversions, args.packages,
+                                args.all_combinations):
+            results[name] = {
+                "cold": measure(func, args.cold_number, cold=True),
+                "warm": measure(func, args.number, cold=False),
+            }
+            print(f"{name:<40}{results[name]['cold']['median_ms']:>10.2f}"
+                  f"{results[name]['warm']['median_ms']:>10.2f}")
+    return {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(),
+            "watermark": watermark.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "refs": args.refs,
+            "iversions": args.iversions,
+            "packages": args.packages,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Return `[(case, mode, old_ms, new_ms), ...]` for slower cases"""
+    slower = []
+    for name, modes in current["results"].items():
+        for mode, stats in modes.items():
+            try:
+                old = baseline["results"][name][mode]["median_ms"]
+            except KeyError:
+                continue
+            if stats["median_ms"] > old * tolerance:
+                slower.append((name, mode, old, stats["median_ms"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-n", "--number", type=int, default=20,
+                        help="warm runs per case")
+    parser.add_argument("--cold-number", type=int, default=5,
+                        help="cold runs per case")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--refs", type=int, default=10000)
+    parser.add_argument("--iversions", type=int, default=200)
+    parser.add_argument("--packages", type=int, default=50)
+    parser.add_argument("--all-combinations", action="store_true")
+    parser.add_argument("--compare", metavar="BASELINE")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+    if shutil.which("git") is None:
+        parser.error("the Git fixture requires the git executable")
+
+    print(f"{'case':<40}{'cold (ms)':>10}{'warm (ms)':>10}")
+    current = run(args)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=1)
+        f.write("\n")
+    print(f"wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        slower = compare(baseline, current, args.tolerance)
+        for name, mode, old, new in slower:
+            print(f"SLOWER {name} ({mode}): {old:.2f} -> {new:.2f} ms")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
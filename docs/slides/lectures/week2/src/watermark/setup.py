@@ -23,6 +23,7 @@ setup(
     packages=find_packages(exclude=[]),
     install_requires=[
         "ipython",
+        "packaging",
         'importlib-metadata < 3.0 ; python_version < "3.8"',
     ],
     long_description=dedent(
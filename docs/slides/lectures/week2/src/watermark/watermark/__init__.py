@@ -7,9 +7,41 @@
 
 from __future__ import absolute_import
 
-from .version import __version__
+import importlib
 
-from watermark.magic import *
-from watermark.watermark import watermark
+from watermark.watermark import watermark, refresh, fingerprint
+from watermark.watermark import register_timing_callback
+from watermark.watermark import unregister_timing_callback
+from watermark.pools import workers
 
-__all__ = ["watermark", "magic"]
+__all__ = ["watermark", "refresh", "fingerprint", "register_timing_callback",
+           "unregister_timing_callback", "workers", "magic"]
+
+# Importing IPython is slow; the magic and the package version are only
+# loaded on first use (PEP 562) so scripts calling watermark() skip them
+_LAZY_ATTRIBUTES = {
+    "magic": ("watermark.magic", None),
+    "WaterMark": ("watermark.magic", "WaterMark"),
+    "PackageNotFoundError": ("watermark.magic", "PackageNotFoundError"),
+    "__version__": ("watermark.version", "__version__"),
+}
+
+
+def __getattr__(name):
+    try:
+        module_name, attr = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}") from None
+    module = importlib.import_module(module_name)
+    return module if attr is None else getattr(module, attr)
+
+
+def load_ipython_extension(ipython):
+    from watermark.magic import load_ipython_extension
+    load_ipython_extension(ipython)
+
+
+def unload_ipython_extension(ipython):
+    from watermark.magic import unload_ipython_extension
+    unload_ipython_extension(ipython)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Command line interface for watermark.
+
+    python -m watermark stamp [options] PATH [PATH ...]
+    python -m watermark diff [--json] BASE SNAPSHOT [SNAPSHOT ...]
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import json
+import sys
+
+from watermark import snapshot
+from watermark.stamp import stamp_paths
+from watermark.watermark import watermark
+
+
+def _stamp(args):
+    flags = {
+        "author": args.author,
+        "python": args.python,
+        "packages": args.packages,
+        "machine": args.machine,
+        "githash": args.githash,
+        "gitrepo": args.gitrepo,
+        "gitbranch": args.gitbranch,
+        "watermark": args.watermark,
+    }
+    if not any(flags.values()):
+        # Leave out the date so that re-stamping an unchanged
+        # environment does not rewrite every file
+        flags.update(python=True, machine=True)
+    text = watermark(**flags)
+
+    results = stamp_paths(args.paths, text, jobs=args.jobs)
+    counts = {}
+    for path, status in results:
+        counts[status] = counts.get(status, 0) + 1
+        if status == "updated" or status.startswith("error"):
+            print(f"{status}: {path}")
+    print(", ".join(f"{count} {status}"
+                    for status, count in sorted(counts.items())) or
+          "no files found")
+    return 1 if any(s.startswith("error") for _, s in results) else 0
+
+
+def _diff(args):
+    base = snapshot.flatten(snapshot.load(args.base))
+    results = {}
+    for path in args.snapshots:
+        results[path] = snapshot.diff(base, snapshot.load(path))
+
+    if args.json:
+        print(json.dumps(results, indent=1))
+    else:
+        for path, result in results.items():
+            text = snapshot.format_diff(result)
+            if len(results) > 1:
+                print(f"--- {args.base}\n+++ {path}")
+            print(text or "no differences")
+    return 1 if any(any(result.values()) for result in results.values()) \
+        else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m watermark",
+        description="Print or record date/time stamps and various "
+                    "system information.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    stamp = commands.add_parser(
+        "stamp",
+        help="insert or update a watermark cell in notebooks and "
+             "py:percent scripts",
+        description="Compute one watermark and write it into every "
+                    ".ipynb and jupytext py:percent file below PATH. "
+                    "Defaults to -v -m when no probe is selected.")
+    stamp.add_argument("paths", nargs="+", metavar="PATH")
+    stamp.add_argument("-a", "--author", type=str,
+                       help="prints author name")
+    stamp.add_argument("-v", "--python", action="store_true",
+                       help="prints Python and IPython version")
+    stamp.add_argument("-p", "--packages", type=str,
+                       help="prints versions of specified Python modules "
+                            "and packages")
+    stamp.add_argument("-m", "--machine", action="store_true",
+                       help="prints system and machine info")
+    stamp.add_argument("-g", "--githash", action="store_true",
+                       help="prints current Git commit hash")
+    stamp.add_argument("-r", "--gitrepo", action="store_true",
+                       help="prints current Git remote address")
+    stamp.add_argument("-b", "--gitbranch", action="store_true",
+                       help="prints current Git branch")
+    stamp.add_argument("-w", "--watermark", action="store_true",
+                       help="prints the current version of watermark")
+    stamp.add_argument("-j", "--jobs", type=int, default=None,
+                       help="number of worker processes (default: all "
+                            "CPUs)")
+    stamp.set_defaults(func=_stamp)
+
+    diff = commands.add_parser(
+        "diff",
+        help="compare snapshots saved with %%watermark --save",
+        description="Report the packages and system fields added, removed "
+                    "or changed in each SNAPSHOT relative to BASE. Exits "
+                    "with status 1 if any snapshot differs.")
+    diff.add_argument("base", metavar="BASE")
+    diff.add_argument("snapshots", nargs="+", metavar="SNAPSHOT")
+    diff.add_argument("--json", action="store_true",
+                      help="print the differences as JSON")
+    diff.set_defaults(func=_diff)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
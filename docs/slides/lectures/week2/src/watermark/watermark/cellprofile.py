@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Per-cell execution profiler behind the `%watermark_profile` magic.
+
+Records the wall time, CPU time and growth of the peak resident set size
+of every executed cell into a fixed-size ring buffer.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import collections
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+CellRecord = collections.namedtuple(
+    "CellRecord",
+    ["execution_count", "wall_time", "cpu_time", "peak_rss_delta", "source"])
+
+FIELDS = CellRecord._fields
+
+
+def _peak_rss():
+    """Return the peak resident set size of the process in bytes"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _first_line(source):
+    for line in (source or "").splitlines():
+        if line.strip():
+            return line.strip()
+    return ""
+
+
+class CellProfiler(object):
+    """Record cell timings through IPython's pre/post_run_cell events.
+
+    Only the last `maxlen` cells are kept.
+    """
+
+    def __init__(self, shell, maxlen=1000):
+        self.shell = shell
+        self.records = collections.deque(maxlen=maxlen)
+        self.enabled = False
+        self._start = None
+
+    def start(self):
+        if not self.enabled:
+            self.shell.events.register("pre_run_cell", self.pre_run_cell)
+            self.shell.events.register("post_run_cell", self.post_run_cell)
+            self.enabled = True
+
+    def stop(self):
+        if self.enabled:
+            self.shell.events.unregister("pre_run_cell", self.pre_run_cell)
+            self.shell.events.unregister("post_run_cell",
+                                         self.post_run_cell)
+            self.enabled = False
+            self._start = None
+
+    def clear(self):
+        self.records.clear()
+
+    def resize(self, maxlen):
+        self.records = collections.deque(self.records, maxlen=maxlen)
+
+    def pre_run_cell(self, info=None):
+        source = getattr(info, "raw_cell", None)
+        self._start = (time.perf_counter(), time.process_time(),
+                       _peak_rss(), source)
+
+    def post_run_cell(self, result=None):
+        if self._start is None:
+            return
+        wall_start, cpu_start, rss_start, source = self._start
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        rss_end = _peak_rss()
+        rss_delta = None if rss_start is None else rss_end - rss_start
+        self._start = None
+
+        info = getattr(result, "info", None)
+        if source is None:
+            source = getattr(info, "raw_cell", None)
+        self.records.append(CellRecord(
+            getattr(result, "execution_count", None), wall, cpu,
+            rss_delta, _first_line(source)))
+
+    def report(self, top=10):
+        """Return a text summary with the `top` slowest cells"""
+        if not self.records:
+            return "No cells recorded."
+        records = list(self.records)
+        total_wall = sum(r.wall_time for r in records)
+        total_cpu = sum(r.cpu_time for r in records)
+        lines = [f"{len(records)} cells, {total_wall:.3f} s wall, "
+                 f"{total_cpu:.3f} s CPU", "",
+                 f"{'cell':>6} {'wall [s]':>9} {'cpu [s]':>9} "
+                 f"{'peak RSS +':>11}  source"]
+        slowest = sorted(records, key=lambda r: r.wall_time,
+                         reverse=True)[:top]
+        for r in slowest:
+            count = "" if r.execution_count is None else r.execution_count
+            rss = "" if r.peak_rss_delta is None else \
+                f"{r.peak_rss_delta / 2 ** 20:.1f} MiB"
+            source = r.source if len(r.source) <= 50 else \
+                r.source[:47] + "..."
+            lines.append(f"{count:>6} {r.wall_time:>9.3f} "
+                         f"{r.cpu_time:>9.3f} {rss:>11}  {source}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write the records to `path` as CSV, or JSON for *.json"""
+        rows = [r._asdict() for r in self.records]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if path.lower().endswith(".json"):
+                import json
+                json.dump(rows, f, indent=1)
+                f.write("\n")
+            else:
+                import csv
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
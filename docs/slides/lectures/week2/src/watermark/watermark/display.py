@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Rich display of watermark output in Jupyter.
+
+`WatermarkDisplay` renders the sections as a compact HTML or Markdown
+table, e.g. when a notebook is exported with nbconvert, and as the usual
+text everywhere else. Rendered tables are memoized per snapshot hash,
+so displaying the same snapshot again does not render it again.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import html
+import json
+
+
+_CACHE_SIZE = 64
+
+# snapshot hash -> rendered HTML, least recently used first
+_html_cache = collections.OrderedDict()
+
+
+def snapshot_hash(sections):
+    """Return a hash of `[(section_name, {key: value}), ...]`"""
+    payload = json.dumps(sections, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _render_html(sections):
+    rows = []
+    for index, (_, section) in enumerate(sections):
+        border = ' style="border-top: 1px solid #ccc"' if index else ""
+        for position, (key, value) in enumerate(section.items()):
+            style = border if position == 0 else ""
+            rows.append(
+                f'<tr{style}><th style="text-align: left">'
+                f'{html.escape(str(key))}</th>'
+                f'<td style="text-align: left">{html.escape(str(value))}'
+                f'</td></tr>')
+    return ('<table class="watermark" style="font-size: smaller">'
+            + "".join(rows) + "</table>")
+
+
+def _markdown_cell(value):
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+class WatermarkDisplay(object):
+    """Watermark output with text, HTML and Markdown representations.
+
+    sections :
+        `[(section_name, {key: value}), ...]` as built by `watermark()`
+    """
+
+    def __init__(self, sections):
+        self.sections = [(name, section) for name, section in sections
+                         if section]
+        self._hash = None
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = snapshot_hash(self.sections)
+        return self._hash
+
+    def __str__(self):
+        from .watermark import _generate_formatted_text
+        return _generate_formatted_text(
+            [section for _, section in self.sections])
+
+    __repr__ = __str__
+
+    def _repr_pretty_(self, p, cycle):
+        p.text(str(self).rstrip("\n"))
+
+    def _repr_html_(self):
+        key = self.hash
+        try:
+            _html_cache.move_to_end(key)
+            return _html_cache[key]
+        except KeyError:
+            pass
+        rendered = _render_html(self.sections)
+        _html_cache[key] = rendered
+        while len(_html_cache) > _CACHE_SIZE:
+            _html_cache.popitem(last=False)
+        return rendered
+
+    def _repr_markdown_(self):
+        lines = ["| | |", "|:--|:--|"]
+        for _, section in self.sections:
+            lines.extend(f"| **{_markdown_cell(key)}** | "
+                         f"{_markdown_cell(value)} |"
+                         for key, value in section.items())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Index of installed distributions used to resolve package versions
+from their metadata instead of importing them.
+
+The index is persisted under the user cache directory, keyed by a
+fingerprint of the `sys.path` directories, so that a new kernel can skip
+metadata parsing until a package is installed or removed.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+
+
+_NORMALIZE_RE = re.compile(r"[-_.]+")
+
+_CACHE_FORMAT = 1
+
+# Directory entries whose appearance or modification changes what
+# `importlib_metadata.distributions()` reports
+_METADATA_SUFFIXES = (".dist-info", ".egg-info", ".egg-link", ".pth", ".egg")
+
+_index = None
+# Probes run on threads; the index is built by the first one only
+_index_lock = threading.Lock()
+
+
+def normalize(name):
+    """Return the PEP 503 normalized form of a distribution name."""
+    return _NORMALIZE_RE.sub("-", name).lower()
+
+
+class DistributionIndex(object):
+    """Map distribution names and top-level modules to versions.
+
+    Built with a single pass over `importlib_metadata.distributions()`.
+    As with `importlib_metadata.version`, the first distribution found on
+    `sys.path` wins when a name is installed more than once.
+    """
+
+    def __init__(self, distributions=()):
+        # normalized distribution name -> (name, version)
+        self.by_name = {}
+        # top-level module name -> [normalized distribution names]
+        self.by_module = {}
+        for name, version, modules in distributions:
+            self.add(name, version, modules)
+
+    def add(self, name, version, modules):
+        key = normalize(name)
+        if key in self.by_name:
+            return
+        self.by_name[key] = (name, version)
+        for module in modules:
+            owners = self.by_module.setdefault(module, [])
+            if key not in owners:
+                owners.append(key)
+
+    def version(self, name):
+        """Return the version for a distribution or top-level module name.
+
+        Returns None when `name` is unknown or is a module shared by
+        several distributions (e.g. a namespace package).
+        """
+        dist = self.by_name.get(normalize(name)) or self.owner(name)
+        if dist is not None:
+            return dist[1]
+        return None
+
+    def owner(self, module):
+        """Return the `(name, version)` of the distribution providing the
+        top-level `module`, or None if unknown or shared."""
+        owners = self.by_module.get(module)
+        if owners is not None and len(owners) == 1:
+            return self.by_name[owners[0]]
+        return None
+
+    def __len__(self):
+        return len(self.by_name)
+
+
+def _top_level_modules(dist):
+    text = dist.read_text("top_level.txt")
+    if text is not None:
+        return [line.strip().replace("/", ".").split(".")[0]
+                for line in text.splitlines() if line.strip()]
+
+    # Fall back to the RECORD file, as `packages_distributions` does
+    modules = set()
+    for path in dist.files or ():
+        parts = path.parts
+        if not parts or parts[0] in ("..", "__pycache__"):
+            continue
+        first = parts[0]
+        if len(parts) == 1:
+            if not first.endswith(".py"):
+                continue
+            first = first[:-3]
+        elif first.endswith((".dist-info", ".egg-info", ".data")):
+            continue
+        if first.isidentifier():
+            modules.add(first)
+    return sorted(modules)
+
+
+def scan_distributions():
+    """Yield `(name, version, top_level_modules)` for each distribution."""
+    # Imported here as it is slow to import and a valid on-disk cache
+    # makes it unnecessary
+    try:
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        # Running on pre-3.8 Python; use importlib-metadata package
+        import importlib_metadata
+
+    for dist in importlib_metadata.distributions():
+        name = dist.metadata["Name"]
+        if not name:
+            continue
+        yield name, dist.version, _top_level_modules(dist)
+
+
+def site_fingerprint(paths=None):
+    """Return a cheap digest of the metadata entries on `sys.path`.
+
+    Only directory listings and the mtimes of `*.dist-info`-like entries
+    are read, so a pip or conda install, upgrade or removal changes the
+    digest without any metadata being parsed.
+    """
+    digest = hashlib.sha1()
+    for path in sys.path if paths is None else paths:
+        path = os.path.abspath(path or os.curdir)
+        digest.update(path.encode("utf-8", "surrogateescape") + b"\0")
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except (IOError, OSError):
+            try:
+                # Zip files and eggs on sys.path
+                digest.update(str(os.stat(path).st_mtime_ns).encode())
+            except (IOError, OSError):
+                pass
+            continue
+        for entry in entries:
+            if not entry.name.endswith(_METADATA_SUFFIXES):
+                continue
+            try:
+                mtime = entry.stat().st_mtime_ns
+            except (IOError, OSError):
+                continue
+            digest.update(f"{entry.name}\0{mtime}\0".encode(
+                "utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def _cache_file():
+    """Return the cache file for this interpreter, or None if disabled."""
+    if os.environ.get("WATERMARK_NO_CACHE"):
+        return None
+    cache_dir = os.environ.get("WATERMARK_CACHE_DIR")
+    if not cache_dir:
+        base = os.environ.get("XDG_CACHE_HOME") or \
+            os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "watermark")
+    prefix = hashlib.sha1(sys.executable.encode("utf-8", "surrogateescape"))
+    return os.path.join(cache_dir,
+                        f"distributions-{prefix.hexdigest()[:12]}.json")
+
+
+def _load_cache(path, fingerprint):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or \
+            data.get("format") != _CACHE_FORMAT or \
+            data.get("fingerprint") != fingerprint:
+        return None
+    return data.get("distributions")
+
+
+def _save_cache(path, fingerprint, dists):
+    data = {
+        "format": _CACHE_FORMAT,
+        "fingerprint": fingerprint,
+        "distributions": dists,
+    }
+    import tempfile
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path),
+                                   suffix=".tmp")
+    except (IOError, OSError):
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        # Atomic, so that concurrent kernels never read a partial file
+        os.replace(tmp, path)
+    except (IOError, OSError, TypeError, ValueError):
+        try:
+            os.remove(tmp)
+        except (IOError, OSError):
+            pass
+
+
+def load_distributions():
+    """Return `[(name, version, top_level_modules), ...]`, reading the
+    on-disk cache when the site fingerprint still matches"""
+    path = _cache_file()
+    if path is None:
+        return list(scan_distributions())
+    fingerprint = site_fingerprint()
+    dists = _load_cache(path, fingerprint)
+    if dists is None:
+        dists = [[name, version, modules]
+                 for name, version, modules in scan_distributions()]
+        _save_cache(path, fingerprint, dists)
+    return dists
+
+
+def get_index():
+    """Return the process-wide distribution index, building it once."""
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DistributionIndex(load_distributions())
+            index = _index
+    return index
+
+
+def imported_distributions(modules=None):
+    """Return the sorted names of the distributions providing `modules`,
+    by default every module imported so far"""
+    index = get_index()
+    if modules is None:
+        modules = list(sys.modules)
+    names = set()
+    for module in modules:
+        dist = index.owner(module.partition(".")[0])
+        if dist is not None:
+            names.add(dist[0])
+    return sorted(names)
+
+
+def clear_cache():
+    """Drop the in-memory index, e.g. after installing packages.
+
+    The on-disk cache revalidates itself against the site fingerprint.
+    """
+    global _index
+    with _index_lock:
+        _index = None
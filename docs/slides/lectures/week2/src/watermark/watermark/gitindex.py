@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Detect uncommitted changes by reading `.git/index` directly.
+
+The working tree is compared with the index the way `git status` does:
+each tracked file is `lstat`ed, and only files whose stat data (mtime,
+size, inode, mode) differ from the index entry, or whose mtime is too
+close to the index's own to be trusted ("racy git"), are hashed. Staged
+changes are found by comparing the root of the index's cache-tree
+extension with the tree of the HEAD commit.
+
+The parsed index is cached per process, keyed on the index file's mtime
+and size, and blob hashes are cached by file stat, so repeated checks
+only cost one `lstat` per tracked file. Untracked files are ignored, as
+with `git describe --dirty`.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import os
+import stat
+import struct
+import zlib
+
+from .gitinfo import GitReadError, find_repository, get_config_value
+from .gitinfo import resolve_ref
+
+
+IndexEntry = collections.namedtuple(
+    "IndexEntry",
+    ["path", "mtime", "ino", "mode", "size", "sha", "stage",
+     "skip_worktree", "intent_to_add"])
+
+Index = collections.namedtuple("Index", ["entries", "root_tree"])
+
+_OBJ_COMMIT = 1
+_ENTRY_HEADER = struct.Struct(">10I20sH")
+
+# index path -> ((mtime_ns, size), Index)
+_index_cache = {}
+# file path -> ((mtime_ns, ctime_ns, size, ino), blob sha); one entry
+# per path, so the cache stays the size of the work tree
+_blob_cache = {}
+# pack index path -> ((mtime_ns, size), bytes)
+_pack_index_cache = {}
+
+
+def _read_varint(data, pos):
+    """Decode the offset varint used for v4 path prefix compression."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, pos
+
+
+def _parse_root_tree(body):
+    """Return the root tree hash from a TREE extension, if still valid."""
+    end = body.index(b"\0")
+    newline = body.index(b"\n", end)
+    entry_count = int(body[end + 1:newline].split(b" ")[0])
+    if entry_count < 0:
+        return None
+    return body[newline + 1:newline + 21].hex()
+
+
+def parse_index(data):
+    """Parse the bytes of a version 2, 3 or 4 index file."""
+    if len(data) < 32 or data[:4] != b"DIRC":
+        raise GitReadError("not a git index file")
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        raise GitReadError(f"unsupported index version {version}")
+
+    entries = []
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        (_, _, mtime_s, mtime_ns, _, ino, mode, _, _, size, sha,
+         flags) = _ENTRY_HEADER.unpack_from(data, pos)
+        pos += _ENTRY_HEADER.size
+        extended = 0
+        if version >= 3 and flags & 0x4000:
+            extended, = struct.unpack_from(">H", data, pos)
+            pos += 2
+        if version == 4:
+            strip, pos = _read_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            # Entries are NUL-padded to a multiple of eight bytes
+            pos = start + ((end - start + 8) // 8) * 8
+        previous = path
+        entries.append(IndexEntry(
+            path, (mtime_s, mtime_ns), ino, mode, size, sha.hex(),
+            (flags >> 12) & 0x3, bool(extended & 0x4000),
+            bool(extended & 0x2000)))
+
+    root_tree = None
+    checksum_start = len(data) - 20
+    while pos + 8 <= checksum_start:
+        signature = data[pos:pos + 4]
+        size, = struct.unpack_from(">I", data, pos + 4)
+        body = data[pos + 8:pos + 8 + size]
+        pos += 8 + size
+        if signature == b"TREE" and body:
+            root_tree = _parse_root_tree(body)
+        elif signature in (b"link", b"sdir"):
+            raise GitReadError("split and sparse indexes are not supported")
+    return Index(entries, root_tree)
+
+
+def read_index(path):
+    """Return the parsed index at `path`, cached on its mtime and size."""
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _index_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, "rb") as f:
+        index = parse_index(f.read())
+    _index_cache[path] = (key, index)
+    return index
+
+
+def _hash_blob(path, st):
+    key = (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino)
+    cached = _blob_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if stat.S_ISLNK(st.st_mode):
+        content = os.readlink(os.fsencode(path))
+        digest = hashlib.sha1(b"blob %d\0" % len(content) + content)
+    else:
+        digest = hashlib.sha1(b"blob %d\0" % st.st_size)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    _blob_cache[path] = (key, digest.hexdigest())
+    return _blob_cache[path][1]
+
+
+def _stat_matches(entry, st, filemode):
+    obj_type = entry.mode >> 12
+    if obj_type == 0o12:
+        if not stat.S_ISLNK(st.st_mode):
+            return False
+    elif not stat.S_ISREG(st.st_mode):
+        return False
+    elif filemode and \
+            bool(st.st_mode & stat.S_IXUSR) != bool(entry.mode & 0o100):
+        return None
+    if (st.st_size & 0xffffffff) != entry.size:
+        return False
+    mtime_s, mtime_ns = entry.mtime
+    if int(st.st_mtime) & 0xffffffff != mtime_s:
+        return False
+    if mtime_ns and st.st_mtime_ns % 1000000000 != mtime_ns:
+        return False
+    if entry.ino and (st.st_ino & 0xffffffff) != entry.ino:
+        return False
+    return True
+
+
+def _worktree_changed(worktree, index, index_mtime, filemode):
+    """Return the path of the first modified tracked file, or None."""
+    for entry in index.entries:
+        if entry.stage or entry.intent_to_add:
+            return entry.path
+        if entry.skip_worktree or entry.mode >> 12 == 0o16:
+            # Sparse checkouts and submodules are not compared
+            continue
+        path = os.path.join(worktree, os.fsdecode(entry.path))
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return entry.path
+        matches = _stat_matches(entry, st, filemode)
+        if matches is None:
+            # The executable bit changed
+            return entry.path
+        # Files modified in the same second the index was written may
+        # still have matching stat data ("racy git") and must be hashed
+        racy = entry.mtime >= index_mtime
+        if matches and not racy:
+            continue
+        if _hash_blob(path, st) != entry.sha:
+            return entry.path
+    return None
+
+
+def _read_pack_index(path):
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _pack_index_cache.get(path)
+    if cached is None or cached[0] != key:
+        with open(path, "rb") as f:
+            cached = (key, f.read())
+        _pack_index_cache[path] = cached
+    return cached[1]
+
+
+def _find_in_pack(idx, sha):
+    """Return the offset of `sha` in the pack of a v2 `.idx`, or None."""
+    if idx[:4] != b"\xfftOc" or struct.unpack_from(">I", idx, 4)[0] != 2:
+        raise GitReadError("unsupported pack index version")
+    fanout = struct.unpack_from(">256I", idx, 8)
+    raw = bytes.fromhex(sha)
+    lo = fanout[raw[0] - 1] if raw[0] else 0
+    hi = fanout[raw[0]]
+    total = fanout[255]
+    names = 8 + 256 * 4
+    while lo < hi:
+        mid = (lo + hi) // 2
+        name = idx[names + mid * 20:names + mid * 20 + 20]
+        if name == raw:
+            offsets = names + total * 24
+            offset, = struct.unpack_from(">I", idx, offsets + mid * 4)
+            if offset & 0x80000000:
+                large = offsets + total * 4 + (offset & 0x7fffffff) * 8
+                offset, = struct.unpack_from(">Q", idx, large)
+            return offset
+        if name < raw:
+            lo = mid + 1
+        else:
+            hi = mid
+    return None
+
+
+def _inflate(f):
+    decompressor = zlib.decompressobj()
+    chunks = []
+    while not decompressor.eof:
+        chunk = f.read(8192)
+        if not chunk:
+            raise GitReadError("truncated object")
+        chunks.append(decompressor.decompress(chunk))
+    return b"".join(chunks)
+
+
+def read_commit(common_dir, sha):
+    """Return the raw body of commit `sha` (loose or undeltified pack)."""
+    objects = os.path.join(common_dir, "objects")
+    try:
+        with open(os.path.join(objects, sha[:2], sha[2:]), "rb") as f:
+            data = _inflate(f)
+    except (IOError, OSError):
+        pass
+    else:
+        header, _, body = data.partition(b"\0")
+        if not header.startswith(b"commit "):
+            raise GitReadError(f"{sha} is not a commit")
+        return body
+
+    pack_dir = os.path.join(objects, "pack")
+    try:
+        names = sorted(os.listdir(pack_dir))
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith(".idx"):
+            continue
+        offset = _find_in_pack(
+            _read_pack_index(os.path.join(pack_dir, name)), sha)
+        if offset is None:
+            continue
+        with open(os.path.join(pack_dir, name[:-4] + ".pack"), "rb") as f:
+            f.seek(offset)
+            byte = f.read(1)[0]
+            obj_type = (byte >> 4) & 0x7
+            while byte & 0x80:
+                byte = f.read(1)[0]
+            if obj_type != _OBJ_COMMIT:
+                # Deltified commits need the full delta machinery
+                raise GitReadError(f"{sha} is stored as a delta")
+            return _inflate(f)
+    raise GitReadError(f"commit {sha} not found")
+
+
+def _commit_tree(common_dir, sha):
+    body = read_commit(common_dir, sha)
+    first_line = body.split(b"\n", 1)[0]
+    if not first_line.startswith(b"tree "):
+        raise GitReadError(f"malformed commit {sha}")
+    return first_line[5:].decode("ascii")
+
+
+def _has_filters(worktree, common_dir):
+    """Return True if content filters may make hashes differ from git's"""
+    autocrlf = (get_config_value(common_dir, "core", None, "autocrlf") or
+                "false").lower()
+    return autocrlf not in ("false", "no", "off", "0") or any(
+        os.path.exists(path) for path in (
+            os.path.join(worktree, ".gitattributes"),
+            os.path.join(common_dir, "info", "attributes")))
+
+
+def is_dirty(path=None):
+    """Return True if tracked files differ from HEAD.
+
+    Raises GitReadError when that cannot be decided without `git`, e.g.
+    for split or sparse indexes, deltified HEAD commits, an invalidated
+    cache tree, or a modified file in a repository using content
+    filters.
+    """
+    worktree, git_dir, common_dir = find_repository(path)
+    if worktree is None:
+        raise GitReadError("work tree unknown when GIT_DIR is set")
+    index_path = os.path.join(git_dir, "index")
+    try:
+        index_st = os.stat(index_path)
+    except OSError:
+        index_st = None
+
+    _, head = resolve_ref(git_dir, common_dir, "HEAD")
+    if index_st is None:
+        # No index yet: dirty only if there is a commit to differ from
+        return head is not None
+
+    index = read_index(index_path)
+    if head is None:
+        return bool(index.entries)
+    if index.root_tree is None:
+        raise GitReadError("index cache tree is not up to date")
+    if index.root_tree != _commit_tree(common_dir, head):
+        return True
+
+    filemode = (get_config_value(common_dir, "core", None, "filemode") or
+                "true").lower() not in ("false", "no", "off", "0")
+    index_mtime = (int(index_st.st_mtime) & 0xffffffff,
+                   index_st.st_mtime_ns % 1000000000)
+    changed = _worktree_changed(worktree, index, index_mtime, filemode)
+    if changed is not None and _has_filters(worktree, common_dir):
+        raise GitReadError("content filters may be in use")
+    return changed is not None
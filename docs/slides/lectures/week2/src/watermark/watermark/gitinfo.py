@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Pure-Python reader for the Git metadata used by watermark.
+
+Resolves HEAD, loose refs, packed-refs, worktree `.git` files and the
+remotes in `config` without spawning a `git` process.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import os
+
+
+class GitReadError(Exception):
+    """Raised when the repository cannot be read without `git` itself."""
+    pass
+
+
+_MAX_SYMREF_DEPTH = 5
+
+
+def find_git_dir(path=None):
+    """Return `(git_dir, common_dir)` for the repository containing `path`.
+
+    `git_dir` holds the per-worktree files (HEAD, index) and `common_dir`
+    the shared ones (refs, packed-refs, config). Both are the same
+    directory for an ordinary checkout.
+    """
+    return find_repository(path)[1:]
+
+
+def find_repository(path=None):
+    """Return `(worktree, git_dir, common_dir)` for `path`.
+
+    `worktree` is the top-level directory of the checkout, or None when
+    it is not known (`GIT_DIR` set in the environment).
+    """
+    env_git_dir = os.environ.get("GIT_DIR")
+    if env_git_dir:
+        git_dir = os.path.abspath(env_git_dir)
+        return (None,) + _check_format(git_dir, _read_common_dir(git_dir))
+
+    current = os.path.abspath(path or os.getcwd())
+    while True:
+        candidate = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return (current,) + _check_format(
+                candidate, _read_common_dir(candidate))
+        if os.path.isfile(candidate):
+            git_dir = _read_gitfile(candidate)
+            return (current,) + _check_format(
+                git_dir, _read_common_dir(git_dir))
+        parent = os.path.dirname(current)
+        if parent == current:
+            raise GitReadError("not a git repository")
+        current = parent
+
+
+def _check_format(git_dir, common_dir):
+    # Repositories using the reftable backend keep refs in binary tables
+    if os.path.isdir(os.path.join(common_dir, "reftable")):
+        raise GitReadError("reftable repositories are not supported")
+    return git_dir, common_dir
+
+
+def _read_gitfile(path):
+    """Follow a `gitdir: <path>` file as written for worktrees/submodules."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if not content.startswith("gitdir:"):
+        raise GitReadError(f"invalid gitfile format: {path}")
+    git_dir = content[len("gitdir:"):].strip()
+    if not os.path.isabs(git_dir):
+        git_dir = os.path.join(os.path.dirname(path), git_dir)
+    git_dir = os.path.normpath(git_dir)
+    if not os.path.isdir(git_dir):
+        raise GitReadError(f"gitdir does not exist: {git_dir}")
+    return git_dir
+
+
+def _read_common_dir(git_dir):
+    commondir_file = os.path.join(git_dir, "commondir")
+    try:
+        with open(commondir_file, "r", encoding="utf-8") as f:
+            common_dir = f.read().strip()
+    except (IOError, OSError):
+        return git_dir
+    if not os.path.isabs(common_dir):
+        common_dir = os.path.join(git_dir, common_dir)
+    return os.path.normpath(common_dir)
+
+
+def _read_first_line(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readline().strip()
+    except (IOError, OSError):
+        return None
+
+
+def _read_packed_ref(common_dir, ref):
+    path = os.path.join(common_dir, "packed-refs")
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except (IOError, OSError):
+        return None
+    with f:
+        for line in f:
+            # Skip the header and peeled (`^<sha>`) lines
+            if line.startswith(("#", "^")):
+                continue
+            sha, _, name = line.rstrip("\n").partition(" ")
+            if name == ref:
+                return sha
+    return None
+
+
+def _read_ref(git_dir, common_dir, ref):
+    """Return the raw content of `ref`, either `ref: ...` or a hash."""
+    # HEAD and other pseudo-refs live in the per-worktree directory
+    for base in (git_dir, common_dir):
+        value = _read_first_line(os.path.join(base, *ref.split("/")))
+        if value:
+            return value
+    return _read_packed_ref(common_dir, ref)
+
+
+def resolve_ref(git_dir, common_dir, ref="HEAD"):
+    """Return `(symbolic_name, commit_hash)` for `ref`.
+
+    `symbolic_name` is the fully qualified branch ref (e.g.
+    `refs/heads/main`) or None for a detached HEAD; `commit_hash` is None
+    for an unborn branch.
+    """
+    name = None
+    for _ in range(_MAX_SYMREF_DEPTH):
+        value = _read_ref(git_dir, common_dir, ref)
+        if value is None:
+            return name, None
+        if not value.startswith("ref:"):
+            return name, value
+        ref = value[len("ref:"):].strip()
+        name = ref
+    raise GitReadError(f"symbolic ref nesting too deep: {ref}")
+
+
+def _parse_config(path):
+    """Parse a git config file into `{(section, subsection): {key: value}}`.
+
+    Section and key names are case-insensitive and therefore lowercased;
+    subsections are kept verbatim. `include` directives are not followed.
+    """
+    config = {}
+    current = None
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except (IOError, OSError):
+        return config
+    with f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line[0] in "#;":
+                continue
+            if line.startswith("["):
+                header = line[1:line.index("]")]
+                section, _, subsection = header.partition(" ")
+                if subsection:
+                    subsection = subsection.strip().strip('"')
+                    subsection = subsection.replace('\\"', '"')
+                    subsection = subsection.replace("\\\\", "\\")
+                elif "." in section:
+                    # Deprecated `[section.subsection]` syntax
+                    section, _, subsection = section.partition(".")
+                current = config.setdefault(
+                    (section.lower(), subsection or None), {})
+                continue
+            if current is None:
+                continue
+            key, sep, value = line.partition("=")
+            value = _strip_config_value(value) if sep else "true"
+            current[key.strip().lower()] = value
+    return config
+
+
+def _strip_config_value(value):
+    value = value.strip()
+    out = []
+    quoted = False
+    escaped = False
+    for ch in value:
+        if escaped:
+            out.append({"n": "\n", "t": "\t", "b": "\b"}.get(ch, ch))
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif ch in "#;" and not quoted:
+            break
+        else:
+            out.append(ch)
+    return "".join(out).strip()
+
+
+def get_config_value(common_dir, section, subsection, key):
+    config = _parse_config(os.path.join(common_dir, "config"))
+    values = config.get((section.lower(), subsection), {})
+    value = values.get(key.lower())
+    if value is None and any(s in ("include", "includeif")
+                             for s, _ in config):
+        # The value may come from an included file; let git resolve it
+        raise GitReadError("config uses include directives")
+    return value
+
+
+def head_commit(path=None):
+    """Return the commit hash HEAD points to, like `git rev-parse HEAD`."""
+    git_dir, common_dir = find_git_dir(path)
+    _, sha = resolve_ref(git_dir, common_dir, "HEAD")
+    if sha is None:
+        raise GitReadError("HEAD does not point to a commit")
+    return sha
+
+
+def head_branch(path=None):
+    """Return the short branch name, like `git rev-parse --abbrev-ref HEAD`.
+
+    A detached HEAD yields "HEAD", matching git.
+    """
+    git_dir, common_dir = find_git_dir(path)
+    name, sha = resolve_ref(git_dir, common_dir, "HEAD")
+    if sha is None:
+        raise GitReadError("HEAD does not point to a commit")
+    if name is None:
+        return "HEAD"
+    for prefix in ("refs/heads/", "refs/remotes/", "refs/tags/", "refs/"):
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
+def remote_url(remote="origin", path=None):
+    """Return `remote.<remote>.url`, like `git config --get`."""
+    _, common_dir = find_git_dir(path)
+    url = get_config_value(common_dir, "remote", remote, "url")
+    return url if url is not None else ""
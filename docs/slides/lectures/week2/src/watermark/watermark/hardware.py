@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Hardware and resource limits as seen from inside the current process.
+
+`multiprocessing.cpu_count()` reports the host's cores; containers and
+batch schedulers usually grant fewer through CPU affinity and cgroup
+quotas. Everything here is read from /proc and /sys (Linux) or
+`os.sysconf`, without spawning processes, and degrades to "unknown" or
+"none" on other platforms.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import math
+import os
+import platform
+
+
+_PROC = "/proc"
+_CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Unlimited cgroup v1 limits are reported as a huge page-aligned value
+_UNLIMITED = 2 ** 60
+
+# Environment variables controlling BLAS/OpenMP thread pools
+THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+
+
+def _cgroup_dirs(controller):
+    """Yield the cgroup directories to check for `controller`, most
+    specific first; `controller` None means the unified (v2) hierarchy"""
+    content = _read(os.path.join(_PROC, "self", "cgroup")) or ""
+    for line in content.splitlines():
+        parts = line.split(":", 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        path = path.lstrip("/")
+        if controller is None and parts[0] == "0" and not controllers:
+            mounts = [_CGROUP_ROOT, os.path.join(_CGROUP_ROOT, "unified")]
+        elif controller is not None and \
+                controller in controllers.split(","):
+            mounts = [os.path.join(_CGROUP_ROOT, controllers),
+                      os.path.join(_CGROUP_ROOT, controller)]
+        else:
+            continue
+        for mount in mounts:
+            # Inside a cgroup namespace the listed path may not exist
+            # below the mount point; the mount root is then our cgroup
+            for directory in (os.path.join(mount, path), mount):
+                if os.path.isdir(directory):
+                    yield directory
+
+
+def cpu_quota():
+    """Return the cgroup CPU quota in CPUs, or None if unlimited."""
+    for directory in _cgroup_dirs(None):
+        value = _read(os.path.join(directory, "cpu.max"))
+        if value:
+            quota, _, period = value.partition(" ")
+            if quota == "max":
+                return None
+            return int(quota) / int(period or 100000)
+    for directory in _cgroup_dirs("cpu"):
+        quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+        period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota and period:
+            if int(quota) <= 0:
+                return None
+            return int(quota) / int(period)
+    return None
+
+
+def available_cpus():
+    """Return the CPUs this process may run on (affinity mask)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count()
+
+
+def effective_cpus():
+    """Return the CPUs usable by this process, honoring the CPU affinity
+    and the cgroup quota (rounded up, as joblib does)."""
+    cpus = available_cpus()
+    quota = cpu_quota()
+    if quota is not None:
+        quota_cpus = max(1, int(math.ceil(quota)))
+        cpus = quota_cpus if cpus is None else min(cpus, quota_cpus)
+    return cpus
+
+
+def memory_limit():
+    """Return the cgroup memory limit in bytes, or None if unlimited."""
+    for directory in _cgroup_dirs(None):
+        value = _read(os.path.join(directory, "memory.max"))
+        if value:
+            return None if value == "max" else int(value)
+    for directory in _cgroup_dirs("memory"):
+        value = _read(os.path.join(directory, "memory.limit_in_bytes"))
+        if value:
+            value = int(value)
+            return None if value >= _UNLIMITED else value
+    return None
+
+
+def total_memory():
+    """Return the physical memory in bytes, or None if unknown."""
+    meminfo = _read(os.path.join(_PROC, "meminfo")) or ""
+    for line in meminfo.splitlines():
+        if line.startswith("MemTotal:"):
+            return int(line.split()[1]) * 1024
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def cpu_model():
+    """Return the CPU model name from /proc/cpuinfo."""
+    cpuinfo = _read(os.path.join(_PROC, "cpuinfo")) or ""
+    for key in ("model name", "Model", "Hardware", "cpu model", "cpu"):
+        for line in cpuinfo.splitlines():
+            name, sep, value = line.partition(":")
+            if sep and name.strip() == key and value.strip():
+                return value.strip()
+    return platform.processor() or "unknown"
+
+
+def thread_settings():
+    """Return the BLAS/OpenMP thread variables set in the environment."""
+    return {name: os.environ[name] for name in THREAD_VARIABLES
+            if name in os.environ}
+
+
+def format_bytes(n_bytes, missing="unknown"):
+    if n_bytes is None:
+        return missing
+    return f"{n_bytes / 2 ** 30:.1f} GiB"
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the installed distributions with the pins of a `poetry.lock`.
+
+Only the `name` and `version` keys of each `[[package]]` table are
+needed, so the lockfile is read line by line instead of being parsed as
+TOML: the long `files = [...]` hash arrays that make up most of a lock
+are skipped without being decoded (only their brackets and quotes are
+followed, to find where they end). Parsed pins are cached per process
+on the file's mtime and size.
+
+Versions are compared as PEP 440 versions, so "1.0" matches "1.0.0".
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import re
+
+from . import distributions
+
+
+# path -> ((mtime_ns, size), {normalized name: (name, version)})
+_pin_cache = {}
+
+
+# `[table]` or `[[array.of.tables]]`, with an optional comment
+_HEADER = re.compile(r"\s*(\[\[?)\s*([^\]\"'#]*?)\s*\]\]?\s*(?:#.*)?$")
+_KEY_VALUE = re.compile(r"\s*([A-Za-z0-9_-]+)\s*=\s*(.*?)\s*$")
+_BASIC_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def _string_value(value):
+    """Return the string of a TOML value (a single-line string, or a
+    bare value up to its comment)"""
+    if value.startswith("'"):
+        return value[1:].partition("'")[0]
+    match = _BASIC_STRING.match(value)
+    if match:
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except ValueError:
+            return match.group(1)
+    return value.partition("#")[0].strip()
+
+
+def _open_brackets(text, depth=0):
+    """Return the array nesting depth after `text`, ignoring brackets in
+    strings and comments"""
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "#":
+            break
+        if char in "\"'":
+            if char == '"':
+                match = _BASIC_STRING.match(text, i)
+                end = match.end() if match else len(text)
+            else:
+                end = text.find("'", i + 1) + 1 or len(text)
+            i = end
+            continue
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        i += 1
+    return depth
+
+
+def parse_pins(lines):
+    """Return `{normalized name: (name, version)}` from poetry.lock lines"""
+    pins = {}
+    name = version = None
+    in_package = False
+    depth = 0           # of a multi-line array being skipped
+    delimiter = None    # of a multi-line string being skipped
+    for line in lines:
+        if delimiter is not None:
+            if delimiter in line:
+                delimiter = None
+            continue
+        if depth > 0:
+            depth = _open_brackets(line, depth)
+            continue
+        header = _HEADER.match(line)
+        if header:
+            if in_package and name and version:
+                pins[distributions.normalize(name)] = (name, version)
+            # Sub-tables such as [package.dependencies] end the keys of
+            # the package itself
+            in_package = header.group(1) == "[[" and \
+                header.group(2) == "package"
+            name = version = None
+            continue
+        match = _KEY_VALUE.match(line)
+        if not match:
+            continue
+        key, value = match.groups()
+        if value[:3] in ('"""', "'''") and value.count(value[:3]) < 2:
+            delimiter = value[:3]
+        elif value.startswith("["):
+            depth = _open_brackets(value)
+        elif in_package and key == "name":
+            name = _string_value(value)
+        elif in_package and key == "version":
+            version = _string_value(value)
+    if in_package and name and version:
+        pins[distributions.normalize(name)] = (name, version)
+    return pins
+
+
+def same_version(locked, installed):
+    """Compare two versions as PEP 440 versions, or as strings if one of
+    them is not a valid version"""
+    from packaging.version import InvalidVersion, Version
+
+    try:
+        return Version(locked) == Version(installed)
+    except InvalidVersion:
+        return locked == installed
+
+
+def read_pins(path):
+    """Return the pins of the lockfile at `path`, cached on its mtime"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _pin_cache.get(path)
+    if cached is None or cached[0] != key:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = (key, parse_pins(f))
+        _pin_cache[path] = cached
+    return cached[1]
+
+
+def check(path, imported=None):
+    """Report drift between the lockfile at `path` and the environment.
+
+    Every locked distribution that is installed must have its pinned
+    version; the distributions named in `imported` (by default those of
+    all imported modules) must also be locked. Locked distributions that
+    are not installed, e.g. optional groups, are only counted.
+
+    Returns a dict for the watermark output: a "Lockfile" summary and
+    one line per drifted distribution.
+    """
+    pins = read_pins(path)
+    index = distributions.get_index()
+    if imported is None:
+        imported = distributions.imported_distributions()
+
+    drift = {}
+    missing = 0
+    for key, (name, locked) in sorted(pins.items()):
+        installed = index.by_name.get(key)
+        if installed is None:
+            missing += 1
+        elif not same_version(locked, installed[1]):
+            drift[name] = f"{locked} locked, {installed[1]} installed"
+    for name in imported:
+        key = distributions.normalize(name)
+        installed = index.by_name.get(key)
+        if key not in pins and installed is not None:
+            drift[installed[0]] = f"not locked, {installed[1]} installed"
+
+    summary = f"{os.path.basename(path)}: {len(pins)} pins, " \
+              f"{len(drift)} drifted"
+    if missing:
+        summary += f", {missing} not installed"
+    info = {"Lockfile": summary}
+    info.update(sorted(drift.items(), key=lambda item: item[0].lower()))
+    return info
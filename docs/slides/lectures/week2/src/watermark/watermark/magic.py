@@ -12,20 +12,47 @@ from IPython.core.magic import line_magic
 from IPython.core.magic_arguments import argument
 from IPython.core.magic_arguments import magic_arguments
 from IPython.core.magic_arguments import parse_argstring
+from IPython.display import display
 
-from watermark import watermark
+from watermark import probes, snapshot
+from watermark.cellprofile import CellProfiler
+from watermark.watermark import ImportTracker
+from watermark.watermark import _format_output
+from watermark.watermark import watermark as _watermark
 
 
 class PackageNotFoundError(Exception):
     pass
 
 
+def _probe_arguments(func):
+    """Add a `%watermark` argument for every registered probe"""
+    # magic_arguments reverses the decorators it collected, so add them
+    # last-to-first to keep the registry order in the help text
+    for probe in reversed(probes.registry()):
+        flags, kwargs = probe.argument()
+        func = argument(*flags, **kwargs)(func)
+    return func
+
+
 @magics_class
 class WaterMark(Magics):
     """
     IPython magic function to print date/time stamps
     and various system information.
     """
+    def __init__(self, shell=None, **kwargs):
+        super(WaterMark, self).__init__(shell=shell, **kwargs)
+        self.import_tracker = None
+        if shell is not None:
+            self.import_tracker = ImportTracker(shell)
+        self.cell_profiler = None
+
+    def close(self):
+        """Remove the event hooks registered by this instance"""
+        if self.cell_profiler is not None:
+            self.cell_profiler.stop()
+
     @magic_arguments()
     @argument('-a', '--author', type=str,
               help='prints author name')
@@ -44,24 +71,16 @@ class WaterMark(Magics):
               help='appends a string "Last updated: "')
     @argument('-c', '--custom_time', type=str,
               help='prints a valid strftime() string')
-    @argument('-v', '--python', action='store_true',
-              help='prints Python and IPython version')
-    @argument('-p', '--packages', type=str,
-              help='prints versions of specified Python modules and packages')
-    @argument('-h', '--hostname', action='store_true',
-              help='prints the host name')
-    @argument('-m', '--machine', action='store_true',
-              help='prints system and machine info')
-    @argument('-g', '--githash', action='store_true',
-              help='prints current Git commit hash')
-    @argument('-r', '--gitrepo', action='store_true',
-              help='prints current Git remote address')
-    @argument('-b', '--gitbranch', action='store_true',
-              help='prints current Git branch')
-    @argument('-w', '--watermark', action='store_true',
-              help='prints the current version of watermark')
-    @argument('-iv', '--iversions', action='store_true',
-              help='prints the name/version of all imported modules')
+    @_probe_arguments
+    @argument('--json', action='store_true',
+              help='prints the watermark as JSON')
+    @argument('--save', type=str, metavar='PATH',
+              help='also saves a JSON snapshot for python -m watermark diff')
+    @argument('--timings', action='store_true',
+              help='prints the wall time spent in each probe')
+    @argument('--timeout', type=float,
+              help='seconds to wait for each probe before reporting it'
+                   ' as "timed out"')
     @line_magic
     def watermark(self, line):
         """
@@ -74,11 +93,69 @@ class WaterMark(Magics):
         # while preserving backward compatibility
         args['current_date'] = args.pop('date')
         args['current_time'] = args.pop('time')
+        output_format = 'json' if args.pop('json') else 'display'
+        save_path = args.pop('save')
         args['watermark_self'] = self
 
-        formatted_text = watermark.watermark(**args)
-        print(formatted_text)
+        if save_path:
+            sections = _watermark(format='dict', **args)
+            snapshot.save(save_path, sections)
+            output = _format_output(list(sections.items()), output_format)
+        else:
+            output = _watermark(format=output_format, **args)
+        if output_format == 'json':
+            print(output)
+        else:
+            # Rendered as a table in notebooks, as text in terminals
+            display(output)
+
+    @magic_arguments()
+    @argument('action', choices=['on', 'off', 'report', 'export', 'clear'],
+              help='start or stop recording, print the slowest cells, '
+                   'write all records to PATH, or discard them')
+    @argument('path', nargs='?',
+              help='output file for export; JSON if it ends in .json, '
+                   'CSV otherwise')
+    @argument('--top', type=int, default=10,
+              help='number of cells shown by report')
+    @argument('--size', type=int, default=None,
+              help='number of cells kept in the ring buffer')
+    @line_magic
+    def watermark_profile(self, line):
+        """
+        Record wall time, CPU time and peak RSS growth of every cell.
+        """
+        args = parse_argstring(self.watermark_profile, line)
+        if self.cell_profiler is None:
+            self.cell_profiler = CellProfiler(self.shell)
+        profiler = self.cell_profiler
+        if args.size is not None:
+            profiler.resize(args.size)
+
+        if args.action == 'on':
+            profiler.start()
+        elif args.action == 'off':
+            profiler.stop()
+        elif args.action == 'clear':
+            profiler.clear()
+        elif args.action == 'report':
+            print(profiler.report(top=args.top))
+        elif args.action == 'export':
+            if not args.path:
+                raise ValueError('%watermark_profile export requires a '
+                                 'PATH')
+            count = profiler.export(args.path)
+            print(f'Exported {count} cells to {args.path}')
 
 
 def load_ipython_extension(ipython):
+    # A %reload_ext without unload (older IPython) must not leave the
+    # previous instance's hooks registered
+    unload_ipython_extension(ipython)
     ipython.register_magics(WaterMark)
+
+
+def unload_ipython_extension(ipython):
+    previous = ipython.magics_manager.registry.pop("WaterMark", None)
+    if previous is not None:
+        previous.close()
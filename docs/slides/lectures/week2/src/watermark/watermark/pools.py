@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Compare package versions between a process and the workers of its pools.
+
+Estimators called with `n_jobs` run in joblib's reusable loky executor
+or a `multiprocessing` pool, whose workers may have been started from a
+different interpreter or environment than the notebook kernel. The
+check sends one small task to each worker of an existing pool; the task
+reads the versions from the worker's own distribution metadata (no
+imports), and the results are compared with the parent process.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import concurrent.futures
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+
+from . import distributions
+
+
+def _environment(packages, index=None):
+    if index is None:
+        index = distributions.get_index()
+    return {
+        "pid": os.getpid(),
+        "Python": platform.python_version(),
+        "Python executable": sys.executable,
+        "packages": {name: index.version(name) or "not installed"
+                     for name in packages},
+    }
+
+
+def _worker_environment(packages, barrier=None, timeout=None):
+    """Task run inside the workers.
+
+    Each task waits at `barrier` until every worker holds one, so no
+    worker runs two of them. The index is built afresh: a forked worker
+    inherits the parent's, which would always match.
+    """
+    if barrier is not None:
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            # Some workers are busy; report this one anyway
+            pass
+    index = distributions.DistributionIndex(
+        distributions.load_distributions())
+    return _environment(packages, index)
+
+
+def _reusable_executor(n_workers):
+    """Return joblib's reusable loky executor, as used with `n_jobs`"""
+    try:
+        from joblib.externals.loky import get_reusable_executor
+    except ImportError:
+        try:
+            from loky import get_reusable_executor
+        except ImportError:
+            raise ImportError(
+                "checking workers by count requires joblib or loky; "
+                "pass the pool object to watermark.workers() instead"
+            ) from None
+    return get_reusable_executor(max_workers=n_workers)
+
+
+def _pool_size(pool):
+    # multiprocessing.pool.Pool, concurrent.futures and loky executors
+    for attr in ("_processes", "_max_workers"):
+        size = getattr(pool, attr, None)
+        if isinstance(size, int):
+            return size
+    return None
+
+
+def _collect(pool, packages, tasks, timeout, barrier=None):
+    args = (packages, barrier, timeout)
+    if hasattr(pool, "apply_async"):
+        pending = [pool.apply_async(_worker_environment, args)
+                   for _ in range(tasks)]
+
+        def result(task, remaining):
+            return task.get(remaining)
+    elif hasattr(pool, "submit"):
+        pending = [pool.submit(_worker_environment, *args)
+                   for _ in range(tasks)]
+
+        def result(task, remaining):
+            return task.result(remaining)
+    else:
+        raise TypeError(
+            f"expected a multiprocessing pool or an executor, not "
+            f"{type(pool).__name__}")
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    reports = {}
+    for task in pending:
+        remaining = None
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+        try:
+            report = result(task, remaining)
+        except (multiprocessing.TimeoutError,
+                concurrent.futures.TimeoutError):
+            # The worker is busy; the count shows the gap
+            continue
+        reports[report["pid"]] = report
+    return [reports[pid] for pid in sorted(reports)]
+
+
+def compare(parent, reports):
+    """Return `{key: description}` of every value differing between the
+    parent environment and the worker `reports`"""
+    mismatches = {}
+    keys = [("Python", None), ("Python executable", None)]
+    keys.extend(("packages", name) for name in sorted(parent["packages"]))
+    for section, key in keys:
+        expected = parent[section] if key is None else \
+            parent[section][key]
+        found = {}
+        for report in reports:
+            value = report[section] if key is None else \
+                report[section].get(key, "not installed")
+            if value != expected:
+                found.setdefault(value, []).append(str(report["pid"]))
+        if found:
+            others = "; ".join(f"{value} in workers {', '.join(pids)}"
+                               for value, pids in sorted(found.items()))
+            mismatches[key or section] = f"{expected} in parent; {others}"
+    return mismatches
+
+
+def workers(pool, packages=None, timeout=30, tasks=None):
+    """Report package and interpreter version mismatches between this
+    process and the workers of `pool`.
+
+    pool :
+        a `multiprocessing.pool.Pool`, a `concurrent.futures` executor,
+        a loky executor, or an int N to use joblib's reusable executor
+        with N workers (the one joblib reuses for `n_jobs=N`)
+
+    packages :
+        distribution names to compare; defaults to the distributions
+        of all modules imported in this process
+
+    timeout :
+        seconds to wait for the workers
+
+    tasks :
+        number of tasks to send when the pool size is unknown (default
+        4); otherwise every worker runs exactly one
+
+    No new pool is created when one is passed; workers that are busy
+    for longer than `timeout` are not checked.
+    """
+    if isinstance(pool, int):
+        pool = _reusable_executor(pool)
+    if packages is None:
+        packages = distributions.imported_distributions()
+    elif isinstance(packages, str):
+        packages = [name.strip() for name in packages.split(",")
+                    if name.strip()]
+    size = _pool_size(pool)
+    parent = _environment(packages)
+    if size is None:
+        reports = _collect(pool, list(packages), tasks or 4, timeout)
+    else:
+        with multiprocessing.Manager() as manager:
+            reports = _collect(pool, list(packages), size, timeout,
+                               manager.Barrier(size))
+    mismatches = compare(parent, reports)
+    checked = f"{len(reports)}" if size is None or len(reports) >= size \
+        else f"{len(reports)} of {size}"
+    summary = {0: "no mismatches", 1: "1 mismatch"}.get(
+        len(mismatches), f"{len(mismatches)} mismatches")
+    plural = "" if len(packages) == 1 else "s"
+    info = {"Workers": f"{checked} checked, {len(packages)} package{plural}, "
+                       f"{summary}"}
+    info.update(mismatches)
+    return info
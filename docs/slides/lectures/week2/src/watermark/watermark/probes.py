@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the probes that watermark can report.
+
+A probe is a function taking a `ProbeContext` and returning a dict of
+the lines to print. Probes are referenced as "module:function" strings
+and imported the first time their flag is used. The built-in probes
+live in `watermark.watermark`, which is imported with the package, so
+this only saves imports for probes from entry points: their modules
+are not loaded unless their flag is requested.
+
+Besides the built-in probes, other packages can provide probes through
+the "watermark.probes" entry point group, e.g. in setup.cfg:
+
+    [options.entry_points]
+    watermark.probes =
+        condaenv = mypackage.probes:conda_env
+
+which adds a `--condaenv` flag to `%watermark` and a `condaenv=True`
+argument to `watermark()`. Probes can also be added at runtime with
+`register()`.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import importlib
+
+
+ENTRY_POINT_GROUP = "watermark.probes"
+
+
+class Probe(object):
+    """Description of a probe; `target` is only imported by `load()`.
+
+    name :
+        keyword argument of `watermark()` and section name in the dict
+        and JSON output
+
+    target :
+        "module:function" string (or the function itself)
+
+    flags :
+        option strings of the `%watermark` argument
+
+    help :
+        help text of the `%watermark` argument
+
+    type :
+        None for an on/off flag, otherwise the type of its value
+
+    timed_out_key :
+        key of the line shown when the probe times out; None lists each
+        comma-separated value of the flag instead
+    """
+
+    def __init__(self, name, target, flags=None, help=None, type=None,
+                 timed_out_key=""):
+        self.name = name
+        self.target = target
+        self.flags = tuple(flags or (f"--{name}",))
+        self.help = help or f"prints {name}"
+        self.type = type
+        self.timed_out_key = name if timed_out_key == "" else timed_out_key
+        self._func = None if isinstance(target, str) else target
+
+    def __repr__(self):
+        return f"Probe({self.name!r}, {self.target!r})"
+
+    def load(self):
+        if self._func is None:
+            module_name, _, attr = self.target.partition(":")
+            func = importlib.import_module(module_name)
+            for part in attr.split("."):
+                func = getattr(func, part)
+            self._func = func
+        return self._func
+
+    def argument(self):
+        """Return `(flags, kwargs)` for `argparse.add_argument`"""
+        if self.type is None:
+            return self.flags, {"action": "store_true", "help": self.help}
+        return self.flags, {"type": self.type, "help": self.help}
+
+    def timed_out_section(self, value):
+        if self.timed_out_key is None and isinstance(value, str):
+            return {item: "timed out" for item in value.split(",")}
+        return {self.timed_out_key or self.name: "timed out"}
+
+
+class ProbeContext(object):
+    """Passed to every probe function.
+
+    value :
+        value of the probe's flag (True, or the string given for flags
+        taking a value)
+
+    options :
+        all arguments passed to `watermark()`
+
+    watermark_self :
+        the `WaterMark` magics instance when called from IPython
+
+    timings :
+        records sub-spans, e.g. `with context.timings.span("x:y"):`
+    """
+
+    def __init__(self, value, options, watermark_self, timings):
+        self.value = value
+        self.options = options
+        self.watermark_self = watermark_self
+        self.timings = timings
+
+
+_W = "watermark.watermark:"
+
+# In output order
+BUILTIN_PROBES = (
+    Probe("python", _W + "_probe_python", ("-v", "--python"),
+          "prints Python and IPython version",
+          timed_out_key="Python version"),
+    Probe("packages", _W + "_probe_packages", ("-p", "--packages"),
+          "prints versions of specified Python modules and packages",
+          type=str, timed_out_key=None),
+    Probe("machine", _W + "_probe_machine", ("-m", "--machine"),
+          "prints system and machine info", timed_out_key="Machine"),
+    Probe("hostname", _W + "_probe_hostname", ("-h", "--hostname"),
+          "prints the host name", timed_out_key="Hostname"),
+    Probe("githash", _W + "_probe_githash", ("-g", "--githash"),
+          "prints current Git commit hash", timed_out_key="Git hash"),
+    Probe("gitrepo", _W + "_probe_gitrepo", ("-r", "--gitrepo"),
+          "prints current Git remote address", timed_out_key="Git repo"),
+    Probe("gitbranch", _W + "_probe_gitbranch", ("-b", "--gitbranch"),
+          "prints current Git branch", timed_out_key="Git branch"),
+    Probe("iversions", _W + "_probe_iversions", ("-iv", "--iversions"),
+          "prints the name/version of all imported modules",
+          timed_out_key="Imported modules"),
+    Probe("workers", _W + "_probe_workers", ("--workers",),
+          "checks package versions in the N workers of joblib's reusable "
+          "process pool against the kernel", type=int,
+          timed_out_key="Workers"),
+    Probe("lock", _W + "_probe_lock", ("--lock",),
+          "checks installed and imported distributions against the pins "
+          "of a poetry.lock file", type=str, timed_out_key="Lockfile"),
+    Probe("watermark", _W + "_probe_watermark", ("-w", "--watermark"),
+          "prints the current version of watermark",
+          timed_out_key="Watermark"),
+)
+
+# Arguments of `watermark()` and `%watermark` that are not probes
+RESERVED_NAMES = frozenset([
+    "author", "current_date", "datename", "current_time", "iso8601",
+    "timezone", "updated", "custom_time", "watermark_self", "timeout",
+    "format", "timings", "date", "time", "json", "save",
+])
+
+_builtin = {probe.name: probe for probe in BUILTIN_PROBES}
+_registered = {}
+_entry_point_probes = None
+
+
+def register(probe):
+    """Add a probe, or replace the one with the same name"""
+    if not probe.name.isidentifier() or probe.name in RESERVED_NAMES:
+        raise ValueError(f"invalid probe name: {probe.name!r}")
+    _registered[probe.name] = probe
+
+
+def unregister(name):
+    _registered.pop(name, None)
+
+
+def _iter_entry_points():
+    try:
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        # Running on pre-3.8 Python; use importlib-metadata package
+        import importlib_metadata
+
+    entry_points = importlib_metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINT_GROUP)
+    return entry_points.get(ENTRY_POINT_GROUP, ())
+
+
+def _discover():
+    """Read the entry points once; the probe modules are not imported"""
+    global _entry_point_probes
+    if _entry_point_probes is None:
+        found = {}
+        for entry_point in _iter_entry_points():
+            name = entry_point.name.replace("-", "_")
+            if name.isidentifier() and name not in _builtin and \
+                    name not in RESERVED_NAMES:
+                found.setdefault(name, Probe(name, entry_point.value))
+        _entry_point_probes = found
+    return _entry_point_probes
+
+
+def get(name, discover=True):
+    """Return the probe called `name`, or None"""
+    probe = _registered.get(name) or _builtin.get(name)
+    if probe is None and discover:
+        probe = _discover().get(name)
+    return probe
+
+
+def registry(discover=True):
+    """Return all probes in output order: built-in, registered, then
+    those from entry points"""
+    probes = [_registered.get(p.name, p) for p in BUILTIN_PROBES]
+    probes.extend(p for name, p in _registered.items()
+                  if name not in _builtin)
+    if discover:
+        probes.extend(p for name, p in sorted(_discover().items())
+                      if name not in _registered)
+    return probes
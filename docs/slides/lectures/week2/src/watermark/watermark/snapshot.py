@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Save watermark snapshots as JSON and compare them.
+
+A snapshot is the `format="dict"` output of `watermark()` plus an
+"installed" section listing every installed distribution. Snapshots are
+flattened into lists of `((section, key), value)` sorted by key, so two
+of them are compared with a single sorted merge.
+
+License: BSD 3 clause
+"""
+
+from __future__ import absolute_import
+
+import json
+
+from . import distributions
+
+
+# Sections that differ between any two runs and are not compared
+IGNORED_SECTIONS = ("updated", "timings")
+
+# Sections whose keys are package names
+PACKAGE_SECTIONS = ("packages", "iversions", "installed")
+
+
+def take_snapshot(sections):
+    """Return a snapshot of `sections` and the installed distributions"""
+    snapshot = dict(sections)
+    index = distributions.get_index()
+    snapshot["installed"] = {name: version for name, version
+                             in sorted(index.by_name.values())}
+    return snapshot
+
+
+def save(path, sections):
+    """Write a snapshot of the `watermark(format="dict")` output"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(take_snapshot(sections), f, indent=1, default=str)
+        f.write("\n")
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def flatten(snapshot):
+    """Return `[((section, key), value), ...]` sorted by `(section, key)`"""
+    items = [((section, key), str(value))
+             for section, values in snapshot.items()
+             if section not in IGNORED_SECTIONS and isinstance(values, dict)
+             for key, value in values.items()]
+    items.sort(key=lambda item: item[0])
+    return items
+
+
+def diff(old, new):
+    """Compare two snapshots (dicts or flattened lists).
+
+    Returns a dict with "added" and "removed" lists of
+    `(section, key, value)` and a "changed" list of
+    `(section, key, old_value, new_value)`, all sorted by section and key.
+    """
+    old = flatten(old) if isinstance(old, dict) else old
+    new = flatten(new) if isinstance(new, dict) else new
+    added, removed, changed = [], [], []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        (old_key, old_value), (new_key, new_value) = old[i], new[j]
+        if old_key == new_key:
+            if old_value != new_value:
+                changed.append(old_key + (old_value, new_value))
+            i += 1
+            j += 1
+        elif old_key < new_key:
+            removed.append(old_key + (old_value,))
+            i += 1
+        else:
+            added.append(new_key + (new_value,))
+            j += 1
+    removed.extend(key + (value,) for key, value in old[i:])
+    added.extend(key + (value,) for key, value in new[j:])
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def format_diff(result):
+    """Format the output of `diff()` as text, packages before system
+    fields"""
+    lines = []
+    for title, packages in (("Packages", True), ("System", False)):
+        entries = []
+        for kind, sign in (("removed", "-"), ("added", "+")):
+            for section, key, value in result[kind]:
+                if (section in PACKAGE_SECTIONS) == packages:
+                    entries.append((section, key,
+                                    f"{sign} {section}: {key} {value}"))
+        for section, key, old_value, new_value in result["changed"]:
+            if (section in PACKAGE_SECTIONS) == packages:
+                entries.append((section, key,
+                                f"~ {section}: {key} {old_value} -> "
+                                f"{new_value}"))
+        if entries:
+            entries.sort(key=lambda entry: entry[:2])
+            lines.append(f"{title}:")
+            lines.extend("  " + entry[2] for entry in entries)
+    return "\n".join(lines)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import subprocess
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep the on-disk distribution cache out of the user's home"""
+    cache_dir = tmp_path_factory.mktemp("watermark-cache")
+    monkeypatch.setenv("WATERMARK_CACHE_DIR", str(cache_dir))
+    monkeypatch.delenv("WATERMARK_NO_CACHE", raising=False)
+    return cache_dir
+
+
+def _run_git(cwd, *args):
+    out = subprocess.run(["git"] + list(args), cwd=str(cwd), check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return out.stdout.decode("utf-8").strip()
+
+
+@pytest.fixture
+def git():
+    """`git(cwd, *args)` returning the command's stripped output"""
+    if shutil.which("git") is None:
+        pytest.skip("git executable not available")
+    return _run_git
+
+
+@pytest.fixture
+def repo(tmp_path, git):
+    """A repository with one commit of README and src/run.sh"""
+    path = tmp_path / "repo"
+    (path / "src").mkdir(parents=True)
+    git(path, "init", "-q", "-b", "main")
+    git(path, "config", "user.name", "watermark")
+    git(path, "config", "user.email", "watermark@example.com")
+    git(path, "remote", "add", "origin", "https://example.com/repo.git")
+    (path / "README").write_text("hello\n")
+    (path / "src" / "run.sh").write_text("#!/bin/sh\n")
+    git(path, "add", ".")
+    git(path, "commit", "-q", "-m", "initial")
+    return path
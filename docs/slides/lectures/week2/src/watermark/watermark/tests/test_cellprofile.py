@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+
+from watermark.cellprofile import CellProfiler
+
+
+class Events(object):
+    def __init__(self):
+        self.callbacks = {}
+
+    def register(self, event, func):
+        self.callbacks.setdefault(event, []).append(func)
+
+    def unregister(self, event, func):
+        self.callbacks[event].remove(func)
+
+    def trigger(self, event, *args):
+        for func in list(self.callbacks.get(event, [])):
+            func(*args)
+
+
+class Shell(object):
+    def __init__(self):
+        self.events = Events()
+
+
+class Info(object):
+    def __init__(self, raw_cell):
+        self.raw_cell = raw_cell
+
+
+class Result(object):
+    def __init__(self, execution_count, info):
+        self.execution_count = execution_count
+        self.info = info
+
+
+def run_cell(shell, count, source):
+    info = Info(source)
+    shell.events.trigger("pre_run_cell", info)
+    sum(range(10000))
+    shell.events.trigger("post_run_cell", Result(count, info))
+
+
+def test_ring_buffer_and_report(tmp_path):
+    shell = Shell()
+    profiler = CellProfiler(shell, maxlen=3)
+    profiler.start()
+    for count in range(1, 6):
+        run_cell(shell, count, f"\nx = {count}\nprint(x)")
+    profiler.stop()
+    run_cell(shell, 6, "ignored")
+
+    assert [r.execution_count for r in profiler.records] == [3, 4, 5]
+    assert profiler.records[0].source == "x = 3"
+    assert all(r.wall_time >= 0 for r in profiler.records)
+    report = profiler.report(top=2)
+    assert report.startswith("3 cells")
+    assert len(report.splitlines()) == 5
+
+    profiler.export(str(tmp_path / "cells.json"))
+    rows = json.loads((tmp_path / "cells.json").read_text())
+    assert [row["execution_count"] for row in rows] == [3, 4, 5]
+    profiler.export(str(tmp_path / "cells.csv"))
+    with open(str(tmp_path / "cells.csv")) as f:
+        assert len(list(csv.DictReader(f))) == 3
+
+    profiler.clear()
+    assert profiler.report() == "No cells recorded."
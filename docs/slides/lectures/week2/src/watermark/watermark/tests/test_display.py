@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+from watermark import display
+
+watermark = sys.modules["watermark.watermark"]
+
+
+SECTIONS = [("python", {"Python version": "3.11.4"}),
+            ("packages", {"numpy": "1.26.0", "a|b": "<1>"})]
+
+
+def test_text_matches_text_format():
+    obj = display.WatermarkDisplay(SECTIONS)
+    assert str(obj) == watermark._format_output(SECTIONS, "text")
+
+
+def test_html_table_is_escaped_and_memoized(monkeypatch):
+    html = display.WatermarkDisplay(SECTIONS)._repr_html_()
+    assert html.startswith('<table class="watermark"')
+    assert "&lt;1&gt;" in html and html.count("<tr") == 3
+
+    def fail(sections):
+        raise AssertionError("rendered twice")
+
+    monkeypatch.setattr(display, "_render_html", fail)
+    assert display.WatermarkDisplay(list(SECTIONS))._repr_html_() == html
+
+
+def test_markdown():
+    markdown = display.WatermarkDisplay(SECTIONS)._repr_markdown_()
+    assert "| **a\\|b** | <1> |" in markdown.splitlines()
+
+
+def test_display_format():
+    obj = watermark.watermark(python=True, format="display")
+    assert isinstance(obj, display.WatermarkDisplay)
+    assert obj.sections[0][0] == "python"
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+import time
+
+import pytest
+
+from watermark import distributions
+from watermark.watermark import _get_package_version
+
+
+@pytest.fixture
+def site_dir(tmp_path, monkeypatch):
+    dist_info = tmp_path / "fake_heavy-1.2.3.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fake-heavy\nVersion: 1.2.3\n")
+    (dist_info / "top_level.txt").write_text("fakeheavy\n")
+
+    record_info = tmp_path / "fake_record-0.1.dist-info"
+    record_info.mkdir()
+    (record_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fake-record\nVersion: 0.1\n")
+    (record_info / "RECORD").write_text(
+        "fakerecord/__init__.py,,\n"
+        "fake_record-0.1.dist-info/METADATA,,\n")
+
+    for module in ("fakeheavy", "fakerecord"):
+        (tmp_path / module).mkdir()
+        (tmp_path / module / "__init__.py").write_text(
+            "raise RuntimeError('must not be imported')\n")
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    distributions.clear_cache()
+    yield tmp_path
+    distributions.clear_cache()
+
+
+def test_version_from_metadata_without_import(site_dir):
+    assert _get_package_version("fakeheavy") == "1.2.3"
+    assert _get_package_version("fake-heavy") == "1.2.3"
+    assert _get_package_version("Fake_Heavy") == "1.2.3"
+    assert _get_package_version("fakerecord") == "0.1"
+    assert "fakeheavy" not in sys.modules
+    assert "fakerecord" not in sys.modules
+
+
+def test_unknown_module_falls_back_to_import(site_dir):
+    assert _get_package_version("no_such_module_xyz") == "not installed"
+
+
+def test_imported_distributions(site_dir):
+    assert distributions.imported_distributions(
+        ["fakeheavy.sub", "fakerecord", "os"]) == ["fake-heavy",
+                                                   "fake-record"]
+    assert "pytest" in distributions.imported_distributions()
+
+
+def test_index_built_once_across_threads(site_dir, monkeypatch):
+    scans = []
+    scan = distributions.scan_distributions
+
+    def slow_scan():
+        scans.append(1)
+        time.sleep(0.05)
+        return scan()
+
+    monkeypatch.setattr(distributions, "scan_distributions", slow_scan)
+    indexes = []
+    threads = [threading.Thread(
+        target=lambda: indexes.append(distributions.get_index()))
+        for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(scans) == 1
+    assert all(index is indexes[0] for index in indexes)
+
+
+def test_shared_top_level_is_ambiguous():
+    index = distributions.DistributionIndex([
+        ("ns-one", "1.0", ["ns"]),
+        ("ns-two", "2.0", ["ns"]),
+    ])
+    assert index.version("ns") is None
+    assert index.version("ns_one") == "1.0"
+
+
+def test_on_disk_cache(site_dir, _isolated_cache_dir, monkeypatch):
+    assert _get_package_version("fakeheavy") == "1.2.3"
+    assert list(_isolated_cache_dir.glob("distributions-*.json"))
+
+    # A new process with an unchanged site-packages reads the cache only
+    def no_scan():
+        raise AssertionError("metadata must not be parsed")
+
+    distributions.clear_cache()
+    monkeypatch.setattr(distributions, "scan_distributions", no_scan)
+    assert _get_package_version("fakeheavy") == "1.2.3"
+    monkeypatch.undo()
+    monkeypatch.syspath_prepend(str(site_dir))
+
+    # Installing a package invalidates it
+    new_info = site_dir / "fake_new-3.0.dist-info"
+    new_info.mkdir()
+    (new_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fake-new\nVersion: 3.0\n")
+    distributions.clear_cache()
+    assert _get_package_version("fake-new") == "3.0"
+
+
+def test_fingerprint(site_dir):
+    import watermark
+
+    first = watermark.fingerprint()
+    assert len(first) == 16
+    int(first, 16)
+    distributions.clear_cache()
+    assert watermark.fingerprint() == first
+
+    new_info = site_dir / "fake_new-3.0.dist-info"
+    new_info.mkdir()
+    (new_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fake-new\nVersion: 3.0\n")
+    distributions.clear_cache()
+    assert watermark.fingerprint() != first
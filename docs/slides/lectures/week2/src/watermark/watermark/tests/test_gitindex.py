@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from watermark import gitindex, gitinfo
+
+
+def git_dirty(git, cwd):
+    return bool(git(cwd, "status", "--porcelain", "--untracked-files=no"))
+
+
+def age_index(repo):
+    """Move the index mtime forward so entries are not racily clean"""
+    index = repo / ".git" / "index"
+    st = index.stat()
+    os.utime(index, ns=(st.st_atime_ns, st.st_mtime_ns + 5 * 10 ** 9))
+
+
+def test_clean(repo):
+    assert not gitindex.is_dirty(str(repo))
+    age_index(repo)
+    assert not gitindex.is_dirty(str(repo / "src"))
+    (repo / "untracked").write_text("ignored\n")
+    assert not gitindex.is_dirty(str(repo))
+
+
+def test_stat_clean_entries_are_not_hashed(repo, monkeypatch):
+    age_index(repo)
+    monkeypatch.setattr(gitindex, "_hash_blob", None)
+    assert not gitindex.is_dirty(str(repo))
+
+
+def test_racy_same_size_modification(repo, git):
+    # Written within the index's mtime granularity: stat data can match
+    (repo / "README").write_text("HELLO\n")
+    assert git_dirty(git, repo)
+    assert gitindex.is_dirty(str(repo))
+
+
+def test_blob_cache_keeps_one_entry_per_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(gitindex, "_blob_cache", {})
+    path = tmp_path / "file"
+    for i in range(3):
+        path.write_text("x" * i)
+        os.utime(path, ns=(i * 10 ** 9, i * 10 ** 9))
+        sha = gitindex._hash_blob(str(path), os.lstat(path))
+    assert sha == "59b66ba9c5b14567cb3880b892688c26d75bd946"
+    assert list(gitindex._blob_cache) == [str(path)]
+
+
+@pytest.mark.parametrize("change", ["modify", "delete", "chmod", "stage"])
+def test_dirty_matches_git(repo, git, change):
+    if change == "modify":
+        (repo / "README").write_text("hello world\n")
+    elif change == "delete":
+        (repo / "README").unlink()
+    elif change == "chmod":
+        (repo / "src" / "run.sh").chmod(0o755)
+    else:
+        (repo / "README").write_text("hello world\n")
+        git(repo, "add", "README")
+    assert git_dirty(git, repo)
+    try:
+        assert gitindex.is_dirty(str(repo))
+    except gitinfo.GitReadError:
+        # Staging invalidates the cache tree; callers fall back to git
+        assert change == "stage"
+
+
+def test_index_v4_and_packed_commit(repo, git):
+    git(repo, "update-index", "--index-version", "4")
+    git(repo, "gc", "-q")
+    assert not (repo / ".git" / "objects" / git(repo, "rev-parse",
+                                                 "HEAD")[:2]).exists()
+    index = gitindex.read_index(str(repo / ".git" / "index"))
+    assert [e.path for e in index.entries] == [b"README", b"src/run.sh"]
+    assert not gitindex.is_dirty(str(repo))
+    (repo / "src" / "run.sh").write_text("#!/bin/bash\n")
+    assert gitindex.is_dirty(str(repo))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from watermark import gitinfo
+
+
+def test_loose_refs(repo, git):
+    assert gitinfo.head_commit(str(repo)) == git(repo, "rev-parse", "HEAD")
+    assert gitinfo.head_branch(str(repo)) == "main"
+    assert gitinfo.remote_url("origin", str(repo)) == \
+        "https://example.com/repo.git"
+    assert gitinfo.remote_url("upstream", str(repo)) == ""
+
+
+def test_packed_refs_and_subdirectory(repo, git):
+    git(repo, "pack-refs", "--all")
+    subdir = repo / "a" / "b"
+    subdir.mkdir(parents=True)
+    assert not (repo / ".git" / "refs" / "heads" / "main").exists()
+    assert gitinfo.head_commit(str(subdir)) == git(repo, "rev-parse", "HEAD")
+
+
+def test_detached_head(repo, git):
+    git(repo, "checkout", "-q", "--detach")
+    assert gitinfo.head_branch(str(repo)) == "HEAD"
+    assert gitinfo.head_commit(str(repo)) == git(repo, "rev-parse", "HEAD")
+
+
+def test_worktree(repo, git, tmp_path):
+    worktree = tmp_path / "wt"
+    git(repo, "worktree", "add", "-q", "-b", "feature", str(worktree))
+    assert (worktree / ".git").is_file()
+    assert gitinfo.head_branch(str(worktree)) == "feature"
+    assert gitinfo.head_commit(str(worktree)) == \
+        git(worktree, "rev-parse", "HEAD")
+    assert gitinfo.remote_url("origin", str(worktree)) == \
+        "https://example.com/repo.git"
+
+
+def test_not_a_repository(tmp_path, monkeypatch):
+    monkeypatch.delenv("GIT_DIR", raising=False)
+    with pytest.raises(gitinfo.GitReadError):
+        gitinfo.head_commit(str(tmp_path / ".."))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from watermark import hardware
+
+
+@pytest.fixture
+def fake_root(tmp_path, monkeypatch):
+    proc = tmp_path / "proc"
+    (proc / "self").mkdir(parents=True)
+    (proc / "meminfo").write_text("MemTotal:       16384000 kB\n")
+    (proc / "cpuinfo").write_text(
+        "processor\t: 0\nmodel name\t: Fake CPU @ 3.00GHz\n\n"
+        "processor\t: 1\nmodel name\t: Fake CPU @ 3.00GHz\n")
+    cgroup = tmp_path / "cgroup"
+    cgroup.mkdir()
+    monkeypatch.setattr(hardware, "_PROC", str(proc))
+    monkeypatch.setattr(hardware, "_CGROUP_ROOT", str(cgroup))
+    monkeypatch.setattr(hardware, "available_cpus", lambda: 8)
+    return proc, cgroup
+
+
+def test_cgroup_v2(fake_root):
+    proc, cgroup = fake_root
+    (proc / "self" / "cgroup").write_text("0::/kernel.slice\n")
+    (cgroup / "kernel.slice").mkdir()
+    (cgroup / "kernel.slice" / "cpu.max").write_text("150000 100000\n")
+    (cgroup / "kernel.slice" / "memory.max").write_text("4294967296\n")
+
+    assert hardware.cpu_quota() == 1.5
+    assert hardware.effective_cpus() == 2
+    assert hardware.memory_limit() == 4 * 2 ** 30
+    assert hardware.total_memory() == 16384000 * 1024
+    assert hardware.cpu_model() == "Fake CPU @ 3.00GHz"
+
+
+def test_cgroup_v2_unlimited(fake_root):
+    proc, cgroup = fake_root
+    (proc / "self" / "cgroup").write_text("0::/\n")
+    (cgroup / "cpu.max").write_text("max 100000\n")
+    (cgroup / "memory.max").write_text("max\n")
+
+    assert hardware.cpu_quota() is None
+    assert hardware.effective_cpus() == 8
+    assert hardware.memory_limit() is None
+
+
+def test_cgroup_v1_namespaced(fake_root):
+    proc, cgroup = fake_root
+    (proc / "self" / "cgroup").write_text(
+        "4:memory:/docker/abc\n3:cpu,cpuacct:/docker/abc\n0::/\n")
+    # Inside the container namespace the mount root is the own cgroup
+    (cgroup / "cpu,cpuacct").mkdir()
+    (cgroup / "cpu,cpuacct" / "cpu.cfs_quota_us").write_text("400000\n")
+    (cgroup / "cpu,cpuacct" / "cpu.cfs_period_us").write_text("100000\n")
+    (cgroup / "memory").mkdir()
+    (cgroup / "memory" / "memory.limit_in_bytes").write_text(
+        "9223372036854771712\n")
+
+    assert hardware.cpu_quota() == 4
+    assert hardware.effective_cpus() == 4
+    assert hardware.memory_limit() is None
+
+
+def test_thread_settings(monkeypatch):
+    for name in hardware.THREAD_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OMP_NUM_THREADS", "2")
+    assert hardware.thread_settings() == {"OMP_NUM_THREADS": "2"}
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from watermark import lockfile
+
+LOCK = '''\
+[[package]]
+name = "pytest"
+version = "{pytest}"
+description = "pytest: simple powerful testing with Python"
+optional = false
+python-versions = ">=3.8"
+files = [
+    {{file = "pytest-{pytest}.tar.gz", hash = "sha256:00"}},
+]
+
+[package.dependencies]
+name = "not-a-package"
+
+[package.extras]
+testing = ["argcomplete"]
+
+[[package]]
+name = "No_Such.Package"
+version = "1.0"
+
+[metadata]
+lock-version = "2.0"
+'''
+
+
+@pytest.fixture
+def lock_path(tmp_path):
+    path = tmp_path / "poetry.lock"
+    path.write_text(LOCK.format(pytest=pytest.__version__))
+    return path
+
+
+def test_parse_pins(lock_path):
+    assert lockfile.read_pins(str(lock_path)) == {
+        "pytest": ("pytest", pytest.__version__),
+        "no-such-package": ("No_Such.Package", "1.0"),
+    }
+
+
+def test_pins_cached_on_mtime(lock_path, monkeypatch):
+    pins = lockfile.read_pins(str(lock_path))
+    monkeypatch.setattr(lockfile, "parse_pins", None)
+    assert lockfile.read_pins(str(lock_path)) is pins
+
+
+def test_check(lock_path):
+    assert lockfile.check(str(lock_path), imported=["pytest"]) == {
+        "Lockfile": "poetry.lock: 2 pins, 0 drifted, 1 not installed"}
+
+    # Equal as versions, not as strings
+    lock_path.write_text(LOCK.format(pytest=pytest.__version__ + ".0"))
+    assert lockfile.check(str(lock_path), imported=["pytest"]) == {
+        "Lockfile": "poetry.lock: 2 pins, 0 drifted, 1 not installed"}
+
+    lock_path.write_text(LOCK.format(pytest="0.1"))
+    info = lockfile.check(str(lock_path), imported=["pytest", "pluggy"])
+    assert info["Lockfile"] == \
+        "poetry.lock: 2 pins, 2 drifted, 1 not installed"
+    assert info["pytest"] == f"0.1 locked, {pytest.__version__} installed"
+    assert info["pluggy"].startswith("not locked, ")
+
+
+def test_parse_pins_layout_variants():
+    lines = '''\
+[[package]]
+name = "early"
+version = "0.1"
+description = """
+[[package]]
+name = "inside-a-string"
+"""
+files = [
+    {file = "early-0.1.tar.gz", hash = "sha256:00"},
+    ["[[package]]", "name = 'inside-an-array'"],
+]
+
+  [[ package ]]   # a comment
+  name   =   "Indented"  # trailing comment
+  version = '2.0.0rc1'
+
+[[package]]
+version = "1.0"
+name = "escaped\\u002Dname"
+[package.dependencies]
+version = "9.9"
+'''.splitlines(True)
+    assert lockfile.parse_pins(lines) == {
+        "early": ("early", "0.1"),
+        "indented": ("Indented", "2.0.0rc1"),
+        "escaped-name": ("escaped-name", "1.0"),
+    }
+
+
+@pytest.mark.parametrize("locked, installed, same", [
+    ("1.0", "1.0.0", True),
+    ("2.0.0rc1", "2.0.0-rc1", True),
+    ("1.0.post1", "1.0", False),
+    ("not-a-version", "not-a-version", True),
+    ("not-a-version", "1.0", False),
+])
+def test_same_version(locked, installed, same):
+    assert lockfile.same_version(locked, installed) is same
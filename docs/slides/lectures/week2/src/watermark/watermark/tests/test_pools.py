@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import multiprocessing
+import os
+
+import pytest
+
+from watermark import distributions, pools
+
+
+@pytest.mark.parametrize("kind", ["pool", "executor"])
+def test_workers_match_parent(kind):
+    if kind == "pool":
+        pool = multiprocessing.Pool(2)
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(2)
+    with pool:
+        info = pools.workers(pool, packages=["pytest", "nonexistent"])
+    assert info == {"Workers": "2 checked, 2 packages, no mismatches"}
+
+
+@pytest.mark.parametrize("kind", ["pool", "executor"])
+def test_workers_read_their_own_metadata(kind, monkeypatch):
+    # Forked workers inherit this stale index; they must not use it
+    monkeypatch.setattr(distributions, "_index", distributions.
+                        DistributionIndex([("pytest", "0.0", ["pytest"])]))
+    context = multiprocessing.get_context("fork")
+    if kind == "pool":
+        pool = context.Pool(2)
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(2, mp_context=context)
+    with pool:
+        info = pools.workers(pool, packages=["pytest"])
+    assert info["Workers"] == "2 checked, 1 package, 1 mismatch"
+    assert info["pytest"].startswith(
+        f"0.0 in parent; {pytest.__version__} in workers ")
+
+
+def test_rejects_other_objects():
+    with pytest.raises(TypeError):
+        pools.workers(object(), packages=[])
+
+
+def test_compare():
+    parent = {"pid": 1, "Python": "3.11.4", "Python executable": "/py",
+              "packages": {"numpy": "1.26.0", "six": "1.16.0"}}
+    same = dict(parent, pid=2)
+    old = dict(parent, pid=3, packages={"numpy": "1.25.2"})
+    assert pools.compare(parent, [same]) == {}
+    assert pools.compare(parent, [same, old]) == {
+        "numpy": "1.26.0 in parent; 1.25.2 in workers 3",
+        "six": "1.16.0 in parent; not installed in workers 3",
+    }
+
+
+def test_worker_environment():
+    report = pools._worker_environment(["pytest"])
+    assert report["pid"] == os.getpid()
+    assert report["packages"]["pytest"] == pytest.__version__
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import pytest
+
+import watermark
+from watermark import probes
+
+
+PROBE_MODULE = """
+def conda_env(context):
+    return {"Conda env": "biof440", "Flag": context.value}
+"""
+
+
+@pytest.fixture
+def plugin_site(tmp_path, monkeypatch):
+    (tmp_path / "wm_plugin_probe.py").write_text(PROBE_MODULE)
+    dist_info = tmp_path / "wm_plugin-0.1.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: wm-plugin\nVersion: 0.1\n")
+    (dist_info / "entry_points.txt").write_text(
+        "[watermark.probes]\ncondaenv = wm_plugin_probe:conda_env\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(probes, "_entry_point_probes", None)
+    yield tmp_path
+    sys.modules.pop("wm_plugin_probe", None)
+    monkeypatch.setattr(probes, "_entry_point_probes", None)
+
+
+def test_entry_point_probe_is_loaded_lazily(plugin_site):
+    probe = probes.get("condaenv")
+    assert probe.flags == ("--condaenv",)
+    assert "wm_plugin_probe" not in sys.modules
+
+    watermark.watermark(python=True)
+    assert "wm_plugin_probe" not in sys.modules
+
+    d = watermark.watermark(python=True, condaenv=True, format="dict")
+    assert list(d) == ["python", "condaenv"]
+    assert d["condaenv"] == {"Conda env": "biof440", "Flag": True}
+
+
+def test_registered_probe():
+    probes.register(probes.Probe(
+        "lockhash", lambda context: {"Lock hash": "abc"},
+        help="prints the lockfile hash"))
+    try:
+        assert watermark.watermark(lockhash=True) == "Lock hash: abc\n"
+    finally:
+        probes.unregister("lockhash")
+    with pytest.raises(ValueError):
+        probes.register(probes.Probe("timeout", lambda context: {}))
+
+
+def test_unknown_probe(monkeypatch):
+    monkeypatch.setattr(probes, "_entry_point_probes", {})
+    with pytest.raises(TypeError):
+        watermark.watermark(no_such_probe=True)
+
+
+def test_magic_arguments_follow_registry():
+    from watermark.magic import WaterMark
+
+    parser = WaterMark.watermark.parser
+    options = {option for action in parser._actions
+               for option in action.option_strings}
+    for probe in probes.registry():
+        assert set(probe.flags) <= options
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from watermark import snapshot
+from watermark.__main__ import main
+
+
+OLD = {
+    "updated": {"Last updated": "2021-08-01"},
+    "python": {"Python version": "3.9.6"},
+    "machine": {"OS": "Linux", "CPU cores": 8},
+    "installed": {"numpy": "1.21.0", "pandas": "1.3.0", "six": "1.16.0"},
+}
+
+NEW = {
+    "updated": {"Last updated": "2021-08-10"},
+    "python": {"Python version": "3.9.6"},
+    "machine": {"OS": "Linux", "CPU cores": 4},
+    "installed": {"numpy": "1.21.1", "pandas": "1.3.0", "scanpy": "1.8.1"},
+}
+
+
+def test_diff():
+    result = snapshot.diff(OLD, NEW)
+    assert result == {
+        "added": [("installed", "scanpy", "1.8.1")],
+        "removed": [("installed", "six", "1.16.0")],
+        "changed": [("installed", "numpy", "1.21.0", "1.21.1"),
+                    ("machine", "CPU cores", "8", "4")],
+    }
+    assert snapshot.diff(OLD, OLD) == \
+        {"added": [], "removed": [], "changed": []}
+
+    text = snapshot.format_diff(result)
+    assert text.splitlines() == [
+        "Packages:",
+        "  ~ installed: numpy 1.21.0 -> 1.21.1",
+        "  + installed: scanpy 1.8.1",
+        "  - installed: six 1.16.0",
+        "System:",
+        "  ~ machine: CPU cores 8 -> 4",
+    ]
+
+
+def test_save_and_cli(tmp_path, capsys):
+    import watermark
+
+    a = tmp_path / "a.json"
+    b = tmp_path / "b.json"
+    snapshot.save(str(a), watermark.watermark(python=True, format="dict"))
+    saved = snapshot.load(str(a))
+    assert saved["python"]["Python version"]
+    assert "pytest" in saved["installed"]
+
+    assert main(["diff", str(a), str(a)]) == 0
+    assert capsys.readouterr().out.strip() == "no differences"
+
+    b.write_text(json.dumps(NEW))
+    assert main(["diff", "--json", str(a), str(b)]) == 1
+    result = json.loads(capsys.readouterr().out)[str(b)]
+    assert ["installed", "scanpy", "1.8.1"] in result["added"]
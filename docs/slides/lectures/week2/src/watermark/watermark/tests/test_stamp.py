@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from watermark import stamp
+
+
+TEXT = "Python version: 3.9.6\nOS            : Linux\n"
+
+SCRIPT = """# %% [markdown]
+# # Week 4
+
+# %%
+import pandas as pd
+"""
+
+NOTEBOOK = {
+    "cells": [{"cell_type": "code", "execution_count": None,
+               "metadata": {}, "outputs": [], "source": ["1 + 1"]}],
+    "metadata": {},
+    "nbformat": 4,
+    "nbformat_minor": 4,
+}
+
+
+def test_update_percent_script():
+    stamped = stamp.update_percent_script(SCRIPT, TEXT)
+    assert stamped.startswith(SCRIPT)
+    assert stamped.endswith(
+        '# %% [markdown] tags=["watermark"]\n'
+        "# ```text\n"
+        "# Python version: 3.9.6\n"
+        "# OS            : Linux\n"
+        "# ```\n")
+    assert stamp.update_percent_script(stamped, TEXT) == stamped
+
+    # An existing watermark cell is replaced in place
+    moved = stamped + "\n# %%\nprint('after')\n"
+    restamped = stamp.update_percent_script(moved, "OS: Darwin\n")
+    assert "# OS: Darwin\n# ```\n\n# %%\nprint('after')\n" in restamped
+    assert "Linux" not in restamped
+
+
+def test_update_notebook():
+    source = json.dumps(NOTEBOOK, indent=1)
+    stamped = stamp.update_notebook(source, TEXT)
+    cells = json.loads(stamped)["cells"]
+    assert len(cells) == 2
+    assert cells[1]["metadata"]["tags"] == ["watermark"]
+    assert "".join(cells[1]["source"]) == "```text\n" + TEXT + "```"
+    assert stamp.update_notebook(stamped, TEXT) == stamped
+
+
+def test_stamp_paths(tmp_path):
+    week = tmp_path / "week4"
+    week.mkdir()
+    (week / "week4.py").write_text(SCRIPT)
+    (week / "helper.py").write_text("x = 1\n")
+    (week / "week4.ipynb").write_text(json.dumps(NOTEBOOK, indent=1))
+
+    first = dict(stamp.stamp_paths([str(tmp_path)], TEXT, jobs=2))
+    assert sorted(first.values()) == ["skipped", "updated", "updated"]
+
+    mtime = (week / "week4.py").stat().st_mtime_ns
+    second = dict(stamp.stamp_paths([str(tmp_path)], TEXT, jobs=1))
+    assert sorted(second.values()) == ["skipped", "unchanged", "unchanged"]
+    assert (week / "week4.py").stat().st_mtime_ns == mtime
+    assert (week / "helper.py").read_text() == "x = 1\n"
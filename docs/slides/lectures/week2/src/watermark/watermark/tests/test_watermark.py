@@ -25,7 +25,166 @@ def test_defaults():
         'Machine',
         'Processor',
         'CPU cores',
-        'Architecture']
+        'Architecture',
+        'CPU model',
+        'Total memory',
+        'Effective CPUs',
+        'CPU quota',
+        'Memory limit',
+        'Thread settings']
 
     for i in expected:
         assert i in clean_txt, print(f'{i} not in {clean_txt}')
+
+
+def test_static_probes_are_cached(monkeypatch):
+    import platform
+
+    calls = []
+
+    def processor():
+        calls.append(1)
+        return "fake-cpu"
+
+    monkeypatch.setattr(platform, "processor", processor)
+    watermark.refresh()
+    try:
+        first = watermark.watermark(machine=True)
+        second = watermark.watermark(machine=True)
+        assert first == second
+        assert "fake-cpu" in first
+        assert len(calls) == 1
+
+        watermark.refresh()
+        watermark.watermark(machine=True)
+        assert len(calls) == 2
+    finally:
+        monkeypatch.undo()
+        watermark.refresh()
+
+
+def test_probe_timeout(monkeypatch):
+    import sys
+    import time
+
+    wm_module = sys.modules["watermark.watermark"]
+
+    def slow_hash(machine):
+        time.sleep(2)
+        return {"Git hash": "never"}
+
+    monkeypatch.setattr(wm_module, "_get_commit_hash", slow_hash)
+    start = time.monotonic()
+    a = watermark.watermark(githash=True, hostname=True,
+                            watermark=True, timeout={"githash": 0.1})
+    assert time.monotonic() - start < 1
+    keys = [line.split(":")[0].strip() for line in a.splitlines() if line]
+    assert keys == ["Hostname", "Git hash", "Watermark"]
+    assert "timed out" in a
+
+
+def test_import_tracker_resolves_each_package_once(monkeypatch):
+    import sys
+    import types
+
+    wm_module = sys.modules["watermark.watermark"]
+    resolved = []
+
+    def fake_version(pkg_name):
+        resolved.append(pkg_name)
+        return "1.0"
+
+    class Shell(object):
+        user_ns = {}
+
+    monkeypatch.setattr(wm_module, "_get_package_version", fake_version)
+    shell = Shell()
+    tracker = wm_module.ImportTracker(shell)
+
+    shell.user_ns["alpha"] = types.ModuleType("alpha")
+    shell.user_ns["beta"] = types.ModuleType("beta.sub")
+    assert resolved == []
+    assert tracker.versions() == {"alpha": "1.0", "beta": "1.0"}
+    assert tracker.versions() == {"alpha": "1.0", "beta": "1.0"}
+    assert sorted(resolved) == ["alpha", "beta"]
+
+    del shell.user_ns["alpha"]
+    assert tracker.versions() == {"beta": "1.0"}
+
+    # refresh() is called after installing packages
+    wm_module.refresh()
+    assert tracker.versions() == {"beta": "1.0"}
+    assert sorted(resolved) == ["alpha", "beta", "beta"]
+
+
+def test_reload_extension_keeps_one_hook():
+    from IPython.testing.globalipapp import get_ipython
+
+    ip = get_ipython()
+    before = len(ip.events.callbacks["post_run_cell"])
+    ip.run_line_magic("load_ext", "watermark")
+    ip.run_line_magic("watermark_profile", "on")
+    ip.run_line_magic("reload_ext", "watermark")
+    ip.run_line_magic("watermark_profile", "on")
+    ip.run_line_magic("reload_ext", "watermark")
+    ip.run_line_magic("watermark_profile", "on")
+    assert len(ip.events.callbacks["post_run_cell"]) == before + 1
+    ip.run_line_magic("unload_ext", "watermark")
+    assert len(ip.events.callbacks["post_run_cell"]) == before
+
+
+def test_import_is_lightweight():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, watermark\n"
+        "watermark.watermark(machine=True, githash=True)\n"
+        "heavy = {'IPython', 'importlib.metadata', 'watermark.magic'}\n"
+        "print(sorted(heavy & set(sys.modules)))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True,
+                         cwd=watermark.__path__[0] + "/..")
+    assert out.stdout.strip() == "[]"
+
+
+def test_structured_formats():
+    import json
+
+    import pytest
+
+    d = watermark.watermark(author="Jane", python=True, packages="pytest",
+                            format="dict")
+    assert list(d) == ["author", "python", "packages"]
+    assert d["author"] == {"Author": "Jane"}
+    assert d["python"]["Python version"]
+    assert d["packages"]["pytest"] == pytest.__version__
+
+    j = watermark.watermark(author="Jane", python=True, packages="pytest",
+                            format="json")
+    assert json.loads(j) == d
+
+    with pytest.raises(ValueError):
+        watermark.watermark(format="yaml")
+
+
+def test_timings_and_callback():
+    spans = []
+
+    def callback(name, start, duration):
+        spans.append(name)
+
+    watermark.register_timing_callback(callback)
+    try:
+        d = watermark.watermark(python=True, packages="pytest,IPython",
+                                hostname=True, timings=True, format="dict")
+    finally:
+        watermark.unregister_timing_callback(callback)
+    assert list(d["timings"]) == ["python", "packages", "packages:pytest",
+                                  "packages:IPython", "hostname", "total"]
+    assert all(value.endswith(" ms") for value in d["timings"].values())
+    assert sorted(spans) == sorted(list(d["timings"])[:-1])
+
+    watermark.watermark(hostname=True)
+    assert len(spans) == 5
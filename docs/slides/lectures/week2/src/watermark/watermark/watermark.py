@@ -9,24 +9,23 @@ License: BSD 3 clause
 
 from __future__ import absolute_import
 
+import contextlib
 import datetime
+import functools
+import hashlib
 import importlib
+import os
 import platform
-import subprocess
+import sys
+import threading
 import time
 import types
-from multiprocessing import cpu_count
-from socket import gethostname
 
-try:
-    import importlib.metadata as importlib_metadata
-except ImportError:
-    # Running on pre-3.8 Python; use importlib-metadata package
-    import importlib_metadata
+# IPython, importlib.metadata, subprocess and socket are imported where
+# they are needed so that `import watermark` stays cheap for scripts
 
-import IPython
-
-from .version import __version__
+from . import distributions, gitinfo, hardware
+from . import probes as _probes
 
 
 def watermark(author=None, current_date=False, datename=False,
@@ -34,7 +33,9 @@ def watermark(author=None, current_date=False, datename=False,
               updated=False, custom_time=None, python=False,
               packages=None, hostname=False, machine=False,
               githash=False, gitrepo=False, gitbranch=False,
-              watermark=False, iversions=False, watermark_self=None):
+              watermark=False, iversions=False, watermark_self=None,
+              timeout=None, format="text", timings=False, workers=None,
+              lock=None, **extra_probes):
 
     '''Function to print date/time stamps and various system information.
 
@@ -97,23 +98,68 @@ def watermark(author=None, current_date=False, datename=False,
         instance of the watermark magics class, which is required
         for iversions.
 
+    timeout :
+        seconds to wait for each probe before reporting it as
+        "timed out"; either a number applied to every probe or a dict
+        keyed by probe name (e.g. {"githash": 2}). Waits indefinitely
+        by default.
+
+    format :
+        "text" (default) returns the formatted text; "dict" returns
+        the sections as a dict keyed by section name (e.g. "python",
+        "packages"); "json" returns that dict serialized as JSON;
+        "display" returns a `WatermarkDisplay` that renders as a table
+        in Jupyter and as the text elsewhere.
+
+    timings :
+        appends the wall time spent in each probe, including every
+        package resolution; see also `register_timing_callback()`.
+
+    workers :
+        checks the package versions inside the workers of a process
+        pool against this process; either the pool or executor, or an
+        int N for joblib's reusable executor with N workers. See
+        `watermark.workers()`.
+
+    lock :
+        path of a poetry.lock file; reports installed distributions
+        whose version differs from their pin, and imported ones that
+        are not locked
+
+    **extra_probes :
+        flags of probes added through the "watermark.probes" entry
+        points or `watermark.probes.register()`, e.g. `condaenv=True`.
+
     '''
     output = []
+    probes = []
     args = locals()
     watermark_self = args['watermark_self']
     del args['watermark_self']
+    del args['output'], args['probes'], args['timeout'], args['format']
+    del args['timings'], args['extra_probes']
+    for name in extra_probes:
+        if _probes.get(name) is None:
+            raise TypeError(
+                f"watermark() got an unexpected keyword argument {name!r}")
+    args.update(extra_probes)
+    probe_timings = _Timings()
+    if format not in _FORMATS:
+        raise ValueError(f"format must be one of {', '.join(_FORMATS)}, "
+                         f"not {format!r}")
 
     if not any(args.values()) or args['iso8601']:
         iso_dt = _get_datetime()
 
     if not any(args.values()):
         args['updated'] = True
-        output.append({"Last updated": iso_dt})
-        output.append(_get_pyversions())
-        output.append(_get_sysinfo())
+        output.append(("updated", {"Last updated": iso_dt}))
+        enabled = [(_probes.get("python"), True),
+                   (_probes.get("machine"), True)]
     else:
         if args['author']:
-            output.append({"Author": args['author'].strip("'\"")})
+            output.append(("author",
+                           {"Author": args['author'].strip("'\"")}))
         if args['updated']:
             value = ""
             if args['custom_time']:
@@ -132,42 +178,241 @@ def watermark(author=None, current_date=False, datename=False,
                         time_str += time.strftime("%Z")
                     values.append(time_str)
                 value = " ".join(values)
-            output.append({"Last updated": value})
-        if args['python']:
-            output.append(_get_pyversions())
-        if args['packages']:
-            output.append(_get_packages(args['packages']))
-        if args['machine']:
-            output.append(_get_sysinfo())
-        if args['hostname']:
-            output.append({"Hostname": gethostname()})
-        if args['githash']:
-            output.append(_get_commit_hash(bool(args['machine'])))
-        if args['gitrepo']:
-            output.append(_get_git_remote_origin(bool(args['machine'])))
-        if args['gitbranch']:
-            output.append(_get_git_branch(bool(args['machine'])))
-        if args['iversions']:
-            output.append(_get_all_import_versions(
-                watermark_self.shell.user_ns))
-        if args['watermark']:
-            output.append({"Watermark": __version__})
-
-    return _generate_formatted_text(output)
+            output.append(("updated", {"Last updated": value}))
+        # Entry points are only read when one of their flags is passed
+        discover = any(_probes.get(name, discover=False) is None
+                       for name in extra_probes)
+        enabled = [(probe, args[probe.name])
+                   for probe in _probes.registry(discover=discover)
+                   if args.get(probe.name)]
+
+    for probe, value in enabled:
+        context = _probes.ProbeContext(value, args, watermark_self,
+                                       probe_timings)
+        probes.append((probe.name, probe.load(), (context,)))
+
+    output.extend(zip([name for name, _, _ in probes],
+                      _run_probes(probes, timeout, probe_timings)))
+    if timings:
+        output.append(("timings", probe_timings.section(probes)))
+    return _format_output(output, format)
+
+
+# Called as `callback(name, start, duration)` for every timed span
+_timing_callbacks = []
+
+
+def register_timing_callback(callback):
+    """Call `callback(name, start, duration)` after each probe.
+
+    `name` is the probe name (e.g. "githash"), or "packages:<name>" for
+    a single package resolution; `start` is a `time.time()` timestamp
+    and `duration` the wall time in seconds. Callbacks run on the probe
+    threads and must be thread-safe.
+    """
+    if callback not in _timing_callbacks:
+        _timing_callbacks.append(callback)
+
+
+def unregister_timing_callback(callback):
+    """Stop calling a callback added by `register_timing_callback()`"""
+    try:
+        _timing_callbacks.remove(callback)
+    except ValueError:
+        pass
+
+
+class _Timings(object):
+    """Wall time of the probes of one `watermark()` call"""
+
+    def __init__(self):
+        self.durations = {}
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start_time = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            # Each name is only written by the thread running its probe
+            self.durations[name] = duration
+            for callback in list(_timing_callbacks):
+                callback(name, start_time, duration)
+
+    def section(self, probes):
+        """Format the durations in probe order, sub-spans after their
+        probe"""
+        durations = dict(self.durations)
+        section = {}
+        for name, _, _ in probes:
+            prefix = name + ":"
+            names = [name] + [key for key in durations
+                              if key.startswith(prefix)]
+            for key in names:
+                if key in durations:
+                    section[key] = f"{durations[key] * 1e3:.2f} ms"
+                elif key == name:
+                    section[key] = "timed out"
+        total = time.perf_counter() - self.start
+        section["total"] = f"{total * 1e3:.2f} ms"
+        return section
+
+
+_FORMATS = ("text", "dict", "json", "display")
+
+
+def _format_output(sections, format):
+    """Render `[(section_name, {key: value}), ...]` in the given format"""
+    if format == "text":
+        return _generate_formatted_text([section for _, section in sections])
+    if format == "display":
+        from .display import WatermarkDisplay
+        return WatermarkDisplay(sections)
+    structured = {name: section for name, section in sections}
+    if format == "json":
+        import json
+        # Some packages report tuples or other objects as their version
+        return json.dumps(structured, default=str)
+    return structured
+
+
+def _timed_out_section(name, args):
+    context = args[0]
+    return _probes.get(name).timed_out_section(context.value)
+
+
+def _probe_timeout(timeout, name):
+    if isinstance(timeout, dict):
+        return timeout.get(name)
+    return timeout
+
+
+class _ProbeThread(threading.Thread):
+    """Run a probe on a daemon thread so that a hung probe cannot
+    keep the interpreter from exiting"""
+
+    def __init__(self, name, func, args, timings):
+        super(_ProbeThread, self).__init__(name=f"watermark-{name}")
+        self.daemon = True
+        self.probe = (name, func, args)
+        self.timings = timings
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = _call_probe(self.probe, self.timings)
+        except BaseException as exc:
+            self.error = exc
+
+
+def _call_probe(probe, timings):
+    name, func, args = probe
+    with timings.span(name):
+        return func(*args)
+
+
+def _run_probes(probes, timeout=None, timings=None):
+    """Run independent probes concurrently; results keep probe order"""
+    if timings is None:
+        timings = _Timings()
+    if not probes:
+        return []
+    if len(probes) == 1 and timeout is None:
+        return [_call_probe(probes[0], timings)]
+
+    start = time.monotonic()
+    threads = [_ProbeThread(name, func, args, timings)
+               for name, func, args in probes]
+    for thread in threads:
+        thread.start()
+    results = []
+    for (name, _, args), thread in zip(probes, threads):
+        limit = _probe_timeout(timeout, name)
+        remaining = None
+        if limit is not None:
+            remaining = max(0.0, start + limit - time.monotonic())
+        thread.join(remaining)
+        if thread.is_alive():
+            results.append(_timed_out_section(name, args))
+        elif thread.error is not None:
+            raise thread.error
+        else:
+            results.append(thread.result)
+    return results
 
 
 def _generate_formatted_text(list_of_dicts):
     result = []
     for section in list_of_dicts:
         if section:
-            text = ""
             longest = max(len(key) for key in section)
-            for key, value in section.items():
-                text += f"{key.ljust(longest)}: {value}\n"
-            result.append(text)
+            result.append("".join(
+                [f"{key.ljust(longest)}: {value}\n"
+                 for key, value in section.items()]))
     return "\n".join(result)
 
 
+def _probe_python(context):
+    return _get_pyversions()
+
+
+def _probe_packages(context):
+    return _get_packages(context.value, context.timings)
+
+
+def _probe_machine(context):
+    return _get_machine_info()
+
+
+def _probe_hostname(context):
+    return _get_hostname()
+
+
+def _probe_githash(context):
+    return _get_commit_hash(bool(context.options['machine']))
+
+
+def _probe_gitrepo(context):
+    return _get_git_remote_origin(bool(context.options['machine']))
+
+
+def _probe_gitbranch(context):
+    return _get_git_branch(bool(context.options['machine']))
+
+
+def _probe_workers(context):
+    from . import pools
+    packages = context.options['packages']
+    tracker = getattr(context.watermark_self, "import_tracker", None)
+    if not packages and tracker is not None:
+        packages = sorted(tracker.versions())
+    return pools.workers(context.value, packages=packages or None)
+
+
+def _probe_lock(context):
+    from . import lockfile
+    tracker = getattr(context.watermark_self, "import_tracker", None)
+    imported = None
+    if tracker is not None:
+        imported = distributions.imported_distributions(tracker.versions())
+    return lockfile.check(context.value, imported=imported)
+
+
+def _probe_iversions(context):
+    tracker = getattr(context.watermark_self, "import_tracker", None)
+    if tracker is not None:
+        return tracker.versions()
+    return _get_all_import_versions(context.watermark_self.shell.user_ns)
+
+
+def _probe_watermark(context):
+    return _get_watermark_version()
+
+
 def _get_datetime(pattern="%Y-%m-%dT%H:%M:%S"):
     try:
         dt = datetime.datetime.now(tz=datetime.timezone.utc)
@@ -177,14 +422,34 @@ def _get_datetime(pattern="%Y-%m-%dT%H:%M:%S"):
     return iso_dt
 
 
-def _get_packages(pkgs):
+def _get_packages(pkgs, timings=None):
     packages = pkgs.split(",")
-    return {package: _get_package_version(package)
-            for package in packages}
+    if timings is None:
+        return {package: _get_package_version(package)
+                for package in packages}
+    versions = {}
+    for package in packages:
+        with timings.span(f"packages:{package}"):
+            versions[package] = _get_package_version(package)
+    return versions
 
 
 def _get_package_version(pkg_name):
     """Return the version of a given package"""
+    version = distributions.get_index().version(pkg_name)
+    if version is None:
+        version = _import_package_version(pkg_name)
+    return version
+
+
+def _import_package_version(pkg_name):
+    """Import a package without distribution metadata to find its version"""
+    try:
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        # Running on pre-3.8 Python; use importlib-metadata package
+        import importlib_metadata
+
     if pkg_name == "scikit-learn":
         pkg_name = "sklearn"
     try:
@@ -208,14 +473,84 @@ def _get_package_version(pkg_name):
     return version
 
 
+def fingerprint(length=16):
+    """Return a short hash identifying the Python environment.
+
+    The digest covers the interpreter implementation and version, the
+    operating system and machine type, and the name and version of every
+    installed distribution. It is computed from the distribution index
+    without importing any package, and is stable across processes and
+    hosts that share the same environment.
+    """
+    digest = hashlib.sha256()
+    header = (platform.python_implementation(), sys.version,
+              sys.platform, platform.machine())
+    digest.update("\0".join(header).encode("utf-8"))
+    index = distributions.get_index()
+    for key in sorted(index.by_name):
+        digest.update(f"\n{key}=={index.by_name[key][1]}".encode("utf-8"))
+    return digest.hexdigest()[:length]
+
+
+# Results of probes that cannot change during the lifetime of the process
+_static_cache = {}
+
+# Bumped by `refresh()`, so `ImportTracker`s drop their resolved versions
+_generation = 0
+
+
+def _static_probe(func):
+    """Memoize a probe until the next call to `refresh()`"""
+    @functools.wraps(func)
+    def wrapper():
+        try:
+            result = _static_cache[func.__name__]
+        except KeyError:
+            result = _static_cache[func.__name__] = func()
+        return dict(result)
+    return wrapper
+
+
+def refresh():
+    """Invalidate the cached system probes and the distribution index.
+
+    Dates, hostname and Git information are never cached and need no
+    refresh; call this after installing packages into a running process.
+    """
+    global _generation
+    _static_cache.clear()
+    distributions.clear_cache()
+    _generation += 1
+
+
+def _get_hostname():
+    from socket import gethostname
+    return {"Hostname": gethostname()}
+
+
+def _get_watermark_version():
+    from .version import __version__
+    return {"Watermark": __version__}
+
+
+@_static_probe
 def _get_pyversions():
     return {
         "Python implementation": platform.python_implementation(),
         "Python version": platform.python_version(),
-        "IPython version": IPython.__version__,
+        "IPython version": _get_ipython_version(),
     }
 
 
+def _get_ipython_version():
+    try:
+        import IPython
+    except ImportError:
+        return "not installed"
+    return IPython.__version__
+
+
+@_static_probe
 def _get_sysinfo():
     return {
         "Compiler": platform.python_compiler(),
@@ -223,49 +558,126 @@ def _get_sysinfo():
         "Release": platform.release(),
         "Machine": platform.machine(),
         "Processor": platform.processor(),
-        "CPU cores": cpu_count(),
+        "CPU cores": os.cpu_count(),
         "Architecture": platform.architecture()[0],
+        "CPU model": hardware.cpu_model(),
+        "Total memory": hardware.format_bytes(hardware.total_memory(),
+                                              "unknown"),
     }
 
 
-def _get_commit_hash(machine):
+def _get_resources():
+    """Limits that the affinity mask, cgroups or the environment may
+    change at runtime, so they are not cached like `_get_sysinfo`"""
+    quota = hardware.cpu_quota()
+    threads = hardware.thread_settings()
+    return {
+        "Effective CPUs": hardware.effective_cpus(),
+        "CPU quota": "none" if quota is None else f"{quota:g}",
+        "Memory limit": hardware.format_bytes(hardware.memory_limit(),
+                                              "none"),
+        "Thread settings": ", ".join(
+            f"{name}={value}" for name, value in threads.items()) or
+        "not set",
+    }
+
+
+def _get_machine_info():
+    info = _get_sysinfo()
+    info.update(_get_resources())
+    return info
+
+
+def _run_git(args):
+    import subprocess
     process = subprocess.Popen(
-        ["git", "rev-parse", "HEAD"], shell=False, stdout=subprocess.PIPE
+        ["git"] + args, shell=False, stdout=subprocess.PIPE
     )
-    git_head_hash = process.communicate()[0].strip()
-    return {"Git hash": git_head_hash.decode("utf-8")}
+    return process.communicate()[0].strip().decode("utf-8")
+
+
+def _get_commit_hash(machine):
+    try:
+        git_head_hash = gitinfo.head_commit()
+    except (gitinfo.GitReadError, IOError, OSError, ValueError):
+        git_head_hash = _run_git(["rev-parse", "HEAD"])
+    info = {"Git hash": git_head_hash}
+    if git_head_hash:
+        info["Git dirty"] = _get_git_dirty()
+    return info
+
+
+def _get_git_dirty():
+    from . import gitindex
+    try:
+        return gitindex.is_dirty()
+    except (gitinfo.GitReadError, IOError, OSError, ValueError):
+        return bool(_run_git(["status", "--porcelain",
+                              "--untracked-files=no"]))
 
 
 def _get_git_remote_origin(machine):
-    process = subprocess.Popen(
-        ["git", "config", "--get", "remote.origin.url"],
-        shell=False,
-        stdout=subprocess.PIPE,
-    )
-    git_remote_origin = process.communicate()[0].strip()
-    return {"Git repo": git_remote_origin.decode("utf-8")}
+    try:
+        git_remote_origin = gitinfo.remote_url("origin")
+    except (gitinfo.GitReadError, IOError, OSError, ValueError):
+        git_remote_origin = _run_git(["config", "--get", "remote.origin.url"])
+    return {"Git repo": git_remote_origin}
 
 
 def _get_git_branch(machine):
-    process = subprocess.Popen(
-        ["git", "rev-parse", "--abbrev-ref", "HEAD"],
-        shell=False,
-        stdout=subprocess.PIPE,
-    )
-    git_branch = process.communicate()[0].strip()
-    return {"Git branch": git_branch.decode("utf-8")}
+    try:
+        git_branch = gitinfo.head_branch()
+    except (gitinfo.GitReadError, IOError, OSError, ValueError):
+        git_branch = _run_git(["rev-parse", "--abbrev-ref", "HEAD"])
+    return {"Git branch": git_branch}
 
 
-def _get_all_import_versions(vars):
-    to_print = {}
+def _imported_packages(vars):
     imported_pkgs = {
         val.__name__.split(".")[0]
         for val in list(vars.values())
         if isinstance(val, types.ModuleType)
     }
     imported_pkgs.discard("builtins")
-    for pkg_name in imported_pkgs:
+    return imported_pkgs
+
+
+def _get_all_import_versions(vars):
+    to_print = {}
+    for pkg_name in _imported_packages(vars):
         pkg_version = _get_package_version(pkg_name)
         if pkg_version not in ("not installed", "unknown"):
             to_print[pkg_name] = pkg_version
     return to_print
+
+
+class ImportTracker(object):
+    """Remember the versions of the modules imported into an IPython
+    namespace.
+
+    `versions()` looks up the top-level packages bound in the namespace
+    when it is called, and resolves the version of each package once, so
+    repeated `%watermark -iv` calls only pay for modules imported since
+    the previous call. `refresh()` drops the resolved versions.
+    """
+
+    def __init__(self, shell):
+        self.shell = shell
+        # top-level package name -> version, or None if not reportable
+        self._resolved = {}
+        self._generation = _generation
+
+    def versions(self):
+        """Return `{package: version}` as `_get_all_import_versions`"""
+        if self._generation != _generation:
+            self._resolved.clear()
+            self._generation = _generation
+        current = _imported_packages(self.shell.user_ns)
+        for pkg_name in current.difference(self._resolved):
+            pkg_version = _get_package_version(pkg_name)
+            if pkg_version in ("not installed", "unknown"):
+                pkg_version = None
+            self._resolved[pkg_name] = pkg_version
+        return {pkg_name: self._resolved[pkg_name]
+                for pkg_name in current
+                if self._resolved[pkg_name] is not None}
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Figure export helpers shared by the lecture scripts.
+
+The package is installed with the course environment (`poetry install`,
+see pyproject.toml), so the scripts of every week import it directly:
+
+    from figexport import show_fig, show_fig2
+"""
+
+from .cache import install, save_chart, savefig
+from .plotlyjs import show_fig, show_fig2, write_html
+
+__all__ = ["show_fig", "show_fig2", "write_html", "savefig", "save_chart",
+           "install"]
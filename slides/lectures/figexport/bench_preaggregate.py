@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the altair specs written with the default data transformer and
+with "preaggregate", for the chart types of the lectures.
+
+Builds an mpg-like DataFrame, serializes each chart both ways (the
+default one with the row limit disabled) and reports the spec sizes and
+serialization times.
+
+    cd slides/lectures
+    python -m figexport.bench_preaggregate [--rows 1000000]
+"""
+
+import argparse
+import json
+import time
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from .preaggregate import register
+
+
+def make_data(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "mpg": np.round(rng.normal(23, 7, rows).clip(9, 46), 1),
+        "cylinders": rng.choice([3, 4, 5, 6, 8], rows),
+        "horsepower": np.round(rng.normal(100, 35, rows).clip(46, 230)),
+        "origin": rng.choice(["usa", "japan", "europe"], rows),
+    })
+
+
+def charts(data):
+    return {
+        "average": alt.Chart(data).mark_bar().encode(
+            x="cylinders:O", y="average(mpg):Q"),
+        "histogram": alt.Chart(data).mark_bar().encode(
+            x=alt.X("mpg:Q", bin=True), y="count()"),
+        "binned heatmap": alt.Chart(data).mark_rect().encode(
+            alt.X("mpg:Q", bin=alt.Bin(maxbins=20)),
+            alt.Y("horsepower:Q", bin=True), alt.Color("count():Q")),
+        "density": alt.Chart(data).transform_density(
+            density="mpg", as_=["mpg", "density"]).mark_area().encode(
+            alt.X("mpg:Q"), alt.Y("density:Q")),
+    }
+
+
+def _serialize(chart, transformer, **options):
+    with alt.data_transformers.enable(transformer, **options):
+        start = time.perf_counter()
+        text = json.dumps(chart.to_dict())
+        return len(text), time.perf_counter() - start
+
+
+def run(rows):
+    register()
+    results = {}
+    for name, chart in charts(make_data(rows)).items():
+        results[name] = (_serialize(chart, "default", max_rows=None),
+                         _serialize(chart, "preaggregate"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    print(f"{args.rows:,} rows")
+    for name, (default, reduced) in run(args.rows).items():
+        print(f"  {name:<15}: {default[0] / 1e6:8.1f} MB in "
+              f"{default[1]:5.2f} s -> {reduced[0] / 1e3:8.1f} kB in "
+              f"{reduced[1]:5.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Static export throughput: `fig.write_image` in a loop vs `ExportPool`.
+
+Exports --figures scatter/heatmap figures to a temporary directory and
+prints figures per second, including renderer start-up, for the loop and
+for pools of each --workers size.
+
+    cd slides/lectures
+    python -m figexport.bench_static [--figures 60] [--workers 1 2 4]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+from .static import ExportPool
+
+
+def make_figures(n, seed=0):
+    rng = np.random.default_rng(seed)
+    figures = []
+    for i in range(n):
+        if i % 2:
+            trace = go.Heatmap(z=rng.random((40, 60)))
+        else:
+            trace = go.Scatter(x=rng.random(500), y=rng.random(500),
+                               mode="markers")
+        figures.append(go.Figure(trace))
+    return figures
+
+
+def run_sequential(figures, directory, fmt, engine):
+    start = time.perf_counter()
+    for i, fig in enumerate(figures):
+        fig.write_image(os.path.join(directory, f"seq{i}.{fmt}"),
+                        engine=engine)
+    return len(figures) / (time.perf_counter() - start)
+
+
+def run_pool(figures, directory, fmt, workers, engine):
+    pool = ExportPool(workers=workers, engine=engine, cache=None)
+    with pool:
+        for i, fig in enumerate(figures):
+            pool.submit(fig, os.path.join(directory, f"pool{i}.{fmt}"))
+    if pool.failed:
+        raise RuntimeError(f"{len(pool.failed)} figures failed: "
+                           f"{next(iter(pool.failed.values()))}")
+    return pool.stats()["figures_per_second"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--figures", type=int, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--format", default="png")
+    parser.add_argument("--engine", default=None)
+    args = parser.parse_args(argv)
+
+    figures = make_figures(args.figures)
+    directory = tempfile.mkdtemp(prefix="figexport-bench-")
+    try:
+        rate = run_sequential(figures, directory, args.format, args.engine
+                              or "auto")
+        print(f"{'write_image loop':<20}{rate:8.2f} figures/s")
+        for workers in args.workers:
+            rate = run_pool(figures, directory, args.format, workers,
+                            args.engine)
+            print(f"{f'pool, {workers} workers':<20}{rate:8.2f} figures/s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Compare plain JSON and base64 typed-array encoding of a heatmap matrix.
+
+Reports the size of the figure data and the time to decode it again.
+The decode times are Python proxies for the browser: `json.loads` of the
+number text stands for `JSON.parse`, base64 decoding into a NumPy buffer
+for the page's `atob` loop into a typed array.
+
+    cd slides/lectures
+    python -m figexport.bench_typedarray [--rows 20000] [--cols 500]
+"""
+
+import argparse
+import base64
+import json
+import time
+
+import numpy as np
+
+from .typedarray import encode_array
+
+
+def _best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(rows, cols, repeat=3, decimals=None, seed=0):
+    rng = np.random.default_rng(seed)
+    # Expression-like values: log-normal, optionally rounded
+    z = rng.lognormal(2.0, 1.0, size=(rows, cols))
+    if decimals is not None:
+        z = np.round(z, decimals)
+
+    text = json.dumps(z.tolist(), separators=(",", ":"))
+    encoded = json.dumps(encode_array(z), separators=(",", ":"))
+    encoded_f8 = json.dumps(encode_array(z, display_digits=17),
+                            separators=(",", ":"))
+
+    def decode_typed():
+        spec = json.loads(encoded)
+        np.frombuffer(base64.b64decode(spec["bdata"]), dtype="<f4")
+
+    return {
+        "values": z.size,
+        "json_bytes": len(text),
+        "typed_bytes": len(encoded),
+        "typed_f8_bytes": len(encoded_f8),
+        "json_decode_s": _best_of(lambda: json.loads(text), repeat),
+        "typed_decode_s": _best_of(decode_typed, repeat),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--cols", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--decimals", type=int, default=None,
+                        help="round the values, as in a reported table")
+    args = parser.parse_args(argv)
+
+    result = run(args.rows, args.cols, args.repeat, args.decimals)
+    mb = 1e6
+    print(f"{result['values']:,} values")
+    print(f"  JSON text      : {result['json_bytes'] / mb:8.1f} MB, "
+          f"decoded in {result['json_decode_s']:.3f} s")
+    print(f"  typed (float32): {result['typed_bytes'] / mb:8.1f} MB, "
+          f"decoded in {result['typed_decode_s']:.3f} s")
+    print(f"  typed (float64): {result['typed_f8_bytes'] / mb:8.1f} MB")
+    print(f"  size ratio     : "
+          f"{result['json_bytes'] / result['typed_bytes']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Skip rewriting figures whose content has not changed.
+
+Each output directory holds a `.figcache.json` manifest mapping file
+names to a hash of the figure spec they were written from (plotly JSON,
+Vega-Lite spec, or the rendered matplotlib canvas) plus the write
+arguments. When a script is re-run and the hash matches, the HTML/PNG/SVG
+is neither rendered nor written, so its mtime does not change and the
+`docs/` build sees nothing to redo.
+
+`install()` routes `Figure.savefig` and altair's `Chart.save` through
+the cache, so the lecture scripts keep their plain `savefig`/`save`
+calls.
+
+The manifest also records when each artifact was last requested; beyond
+`max_entries` artifacts per directory, the least recently used ones
+(figures a script no longer produces) are deleted. Manifests are written
+once, at exit, for the directories where a figure was (re)written or
+where a cache hit's last use is more than `TOUCH_INTERVAL` old, so the
+LRU order has at most that resolution. Before writing, the manifest is
+re-read and merged entry by entry, so scripts sharing an output
+directory keep each other's entries.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import time
+
+MANIFEST = ".figcache.json"
+MAX_ENTRIES = 200
+# Seconds after which a cache hit's new `used` time is worth saving
+TOUCH_INTERVAL = 24 * 3600
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode()
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def plotly_key(fig, **kwargs):
+    """`fig` may also be the figure's JSON, as from `fig.to_json()`"""
+    import plotly
+    spec = fig if isinstance(fig, str) else fig.to_json()
+    return _digest("plotly", plotly.__version__, spec, kwargs)
+
+
+def altair_key(chart, **kwargs):
+    import altair as alt
+    return _digest("altair", alt.__version__, chart.to_dict(), kwargs)
+
+
+def matplotlib_key(fig, **kwargs):
+    import matplotlib
+    fig.canvas.draw()
+    return _digest("matplotlib", matplotlib.__version__,
+                   [fig.dpi, list(fig.get_size_inches())],
+                   bytes(fig.canvas.buffer_rgba()), kwargs)
+
+
+class FigureCache(object):
+    """Content-hash manifest of the figures written to each directory"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._manifests = {}
+        # directory -> names recorded since the last flush
+        self._recorded = {}
+        self._dirty = set()
+        atexit.register(self.flush)
+
+    def _read(self, directory):
+        try:
+            with open(os.path.join(directory, MANIFEST), "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _manifest(self, directory):
+        if directory not in self._manifests:
+            self._manifests[directory] = self._read(directory)
+        return self._manifests[directory]
+
+    def _save(self, directory):
+        path = os.path.join(directory, MANIFEST)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._manifest(directory), f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _evict(self, directory, manifest):
+        excess = len(manifest) - self.max_entries
+        if excess <= 0:
+            return
+        stale = sorted(manifest, key=lambda name: manifest[name]["used"])
+        for name in stale[:excess]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+            del manifest[name]
+
+    def is_current(self, filename, key):
+        """Return True if `filename` exists and was written from `key`"""
+        directory = os.path.dirname(os.path.abspath(filename))
+        entry = self._manifest(directory).get(os.path.basename(filename))
+        return entry is not None and entry["key"] == key and \
+            os.path.exists(filename)
+
+    def record(self, filename, key):
+        """Note that `filename` holds the content hashing to `key`"""
+        directory = os.path.dirname(os.path.abspath(filename))
+        manifest = self._manifest(directory)
+        name = os.path.basename(filename)
+        now = time.time()
+        entry = manifest.get(name)
+        if entry is None or entry["key"] != key or \
+                now - entry["used"] > TOUCH_INTERVAL:
+            self._dirty.add(directory)
+        manifest[name] = {"key": key, "used": now}
+        self._recorded.setdefault(directory, set()).add(name)
+
+    def flush(self):
+        """Merge, evict and save the manifests that changed"""
+        for directory in sorted(self._dirty):
+            # Entries not recorded here may have been changed or evicted
+            # by another script since the manifest was read
+            ours = self._manifest(directory)
+            manifest = self._read(directory)
+            for name in self._recorded.get(directory, ()):
+                manifest[name] = ours[name]
+            self._evict(directory, manifest)
+            self._manifests[directory] = manifest
+            self._save(directory)
+        self._dirty.clear()
+        self._recorded.clear()
+
+    def write(self, filename, key, writer):
+        """Call `writer(filename)` unless `filename` was already written
+        from content hashing to `key`; return True if it was written"""
+        hit = self.is_current(filename, key)
+        if not hit:
+            directory = os.path.dirname(os.path.abspath(filename))
+            os.makedirs(directory, exist_ok=True)
+            writer(filename)
+        self.record(filename, key)
+        return not hit
+
+
+default_cache = FigureCache()
+
+# Unpatched methods, set by install()
+_savefig = None
+_chart_save = None
+
+
+def _with_format(filename, kwargs):
+    """The write arguments for the key; an explicit `format=` wins over
+    the file extension"""
+    options = dict(kwargs)
+    options.setdefault("format", os.path.splitext(filename)[1])
+    return options
+
+
+def savefig(fig, filename, **kwargs):
+    """`fig.savefig(filename, **kwargs)`, skipped if unchanged"""
+    write = _savefig or type(fig).savefig
+    key = matplotlib_key(fig, **_with_format(filename, kwargs))
+    return default_cache.write(filename, key,
+                               lambda path: write(fig, path, **kwargs))
+
+
+def save_chart(chart, filename, **kwargs):
+    """`chart.save(filename, **kwargs)`, skipped if unchanged"""
+    write = _chart_save or type(chart).save
+    key = altair_key(chart, **_with_format(filename, kwargs))
+    return default_cache.write(filename, key,
+                               lambda path: write(chart, path, **kwargs))
+
+
+def install():
+    """Route matplotlib's `Figure.savefig` and altair's `Chart.save`
+    through the cache, so the lecture code keeps calling them as usual,
+    and register the "preaggregate" altair data transformer.
+
+    Only calls with a file name are cached; file objects and extra
+    positional arguments go straight to the original method.
+    """
+    global _savefig, _chart_save
+    if _savefig is None:
+        from matplotlib.figure import Figure
+        _savefig = Figure.savefig
+
+        def cached_savefig(self, fname, *args, **kwargs):
+            if args or not isinstance(fname, (str, os.PathLike)):
+                return _savefig(self, fname, *args, **kwargs)
+            savefig(self, os.fspath(fname), **kwargs)
+
+        Figure.savefig = cached_savefig
+    if _chart_save is None:
+        import altair as alt
+        _chart_save = alt.TopLevelMixin.save
+
+        def cached_save(self, fp, *args, **kwargs):
+            if args or not isinstance(fp, (str, os.PathLike)):
+                return _chart_save(self, fp, *args, **kwargs)
+            save_chart(self, os.fspath(fp), **kwargs)
+
+        alt.TopLevelMixin.save = cached_save
+
+        from .preaggregate import register
+        register()
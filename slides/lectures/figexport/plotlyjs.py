@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Write plotly figures as HTML pages sharing one copy of plotly.js.
+
+`plotly.offline.plot` inlines the full plotly.js bundle (about 3.5 MB)
+into every page. Here the bundle is written once per output directory,
+named after its version so an upgrade never reuses a stale copy, and
+each page references it with a `<script src=...>` tag. Browsers then
+download and compile plotly.js once per deck instead of once per figure.
+"""
+
+import os
+
+from IPython.display import IFrame, display_html
+
+from .cache import default_cache, plotly_key
+
+
+def bundle_name():
+    from plotly.offline import get_plotlyjs_version
+    return f"plotly-{get_plotlyjs_version()}.min.js"
+
+
+def ensure_bundle(directory):
+    """Write plotly.js into `directory` unless it is already there.
+
+    Returns the bundle's file name, relative to `directory`.
+    """
+    name = bundle_name()
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        from plotly.offline import get_plotlyjs
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp_path, path)
+    return name
+
+
+def write_html(fig, filename, auto_play=False, typed_arrays=True,
+               config=None):
+    """Write `fig` to `filename`, referencing the shared plotly.js.
+
+    With `typed_arrays`, large numeric traces are written as base64
+    typed arrays (see `figexport.typedarray`); animated figures, which
+    `auto_play` applies to, are written by `fig.write_html`. `config` is
+    the plotly.js config of the page. Returns False if the file
+    already holds the same figure and was left untouched (see
+    `figexport.cache`).
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+    bundle = ensure_bundle(directory)
+    key = plotly_key(fig, bundle=bundle, auto_play=auto_play,
+                     typed_arrays=typed_arrays, config=config)
+
+    def write(path):
+        page = None
+        if typed_arrays:
+            from .typedarray import to_html
+            page = to_html(fig, bundle, config=config)
+        if page is None:
+            fig.write_html(path, include_plotlyjs=bundle, full_html=True,
+                           auto_play=auto_play, config=config)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(page)
+
+    return default_cache.write(filename, key, write)
+
+
+def show_fig(fig, filename, width="100%", height=500):
+    write_html(fig, filename)
+    display_html(IFrame(filename, height=height, width=width))
+
+
+def show_fig2(filename, width="100%", height=500):
+    display_html(IFrame(filename, width=width, height=height))
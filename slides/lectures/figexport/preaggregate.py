@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+"""
+Aggregate, bin and estimate densities of altair chart data in pandas,
+before the data is written into the spec.
+
+Vega-Lite computes `y="average(mpg)"`, `bin=True` with `count()` and
+`transform_density` in the browser, so altair embeds every row of the
+DataFrame in the saved HTML, and refuses with `MaxRowsError` beyond
+5000 rows. After
+
+    import altair as alt
+    alt.data_transformers.enable("preaggregate")
+
+(the transformer is registered by `figexport.install()`), each
+single-view chart whose data is a DataFrame only carries the rows that
+Vega-Lite would have computed from it:
+
+- leading `density` and `aggregate` transforms are evaluated here, with
+  the algorithms of Vega (Scott's bandwidth, Gaussian kernel, adaptive
+  curve sampling), and replaced by their output rows;
+- encoding aggregates are computed per group of the other encoded
+  fields, binned fields being grouped by Vega's bin boundaries. Each
+  group becomes one row that Vega-Lite aggregates again, which leaves
+  it unchanged, so scales, axes, titles and tooltips stay the same;
+- without aggregates, only the encoded columns are kept.
+
+The row limit then applies to the rows that are left. Charts using
+anything not modelled here (time units, conditions, selections other
+than scale bindings, other leading transforms, composite marks such as
+boxplots) are written as they are.
+
+altair's data transformers only see the data, not the encoding, so the
+rewrite happens in a wrapper of `Chart.to_dict` that only acts while
+"preaggregate" is the enabled transformer.
+"""
+
+import math
+import weakref
+
+import numpy as np
+import pandas as pd
+
+NAME = "preaggregate"
+
+_COMPOSITE_MARKS = {"boxplot", "errorbar", "errorband"}
+
+# Ops that return the value of a one-row group: the aggregated column
+# can keep its field's name, and the channel its aggregate
+_IDEMPOTENT = {"sum", "mean", "average", "median", "min", "max", "q1", "q3",
+               "product"}
+
+# Ops that do not need numeric values
+_COUNTING = {"count", "valid", "missing", "distinct"}
+
+_OPS = {
+    "valid": lambda group: group.count(),
+    "missing": lambda group: group.size() - group.count(),
+    "distinct": lambda group: group.nunique(dropna=False),
+    "sum": lambda group: group.sum(),
+    "mean": lambda group: group.mean(),
+    "average": lambda group: group.mean(),
+    "median": lambda group: group.median(),
+    "min": lambda group: group.min(),
+    "max": lambda group: group.max(),
+    "variance": lambda group: group.var(),
+    "variancep": lambda group: group.var(ddof=0),
+    "stdev": lambda group: group.std(),
+    "stdevp": lambda group: group.std(ddof=0),
+    "q1": lambda group: group.quantile(0.25),
+    "q3": lambda group: group.quantile(0.75),
+    "product": lambda group: group.prod(),
+}
+
+# Vega-Lite's default maxbins per channel (10 for the others)
+_MAX_BINS = dict.fromkeys(
+    ["row", "column", "size", "color", "fill", "stroke", "opacity",
+     "fillOpacity", "strokeOpacity", "strokeWidth", "shape"], 6)
+_MAX_BINS["strokeDash"] = 4
+_NO_BIN_CHANNELS = {"x2", "y2", "text", "latitude2", "longitude2"}
+
+_BIN_PARAMS = {"anchor", "base", "divide", "extent", "maxbins", "minstep",
+               "nice", "step", "steps"}
+_DENSITY_PARAMS = {"density", "groupby", "cumulative", "counts",
+                   "bandwidth", "extent", "minsteps", "maxsteps", "steps",
+                   "as"}
+
+_BIN_EPSILON = 1e-14
+_SQRT_2PI = math.sqrt(2 * math.pi)
+_MIN_RADIANS = 0.5 * math.pi / 180
+
+# Kernel terms evaluated at once by `_kde`
+_CHUNK = 1 << 22
+
+
+def _js_or(*values):
+    """`a || b || ...` for numbers"""
+    for value in values:
+        if value and not math.isnan(value):
+            return value
+    return values[-1]
+
+
+def _numeric(series):
+    """Float values of `series` as the browser sees them (inf -> null)"""
+    if series.dtype.kind not in "iuf":
+        return None
+    values = series.to_numpy(dtype=float)
+    return np.where(np.isinf(values), np.nan, values)
+
+
+# --- bin -------------------------------------------------------------------
+
+def _bins(params, extent):
+    """Return `(start, end, step)` of Vega's bin transform"""
+    maxbins = params.get("maxbins") or 20
+    base = float(params.get("base") or 10)
+    divide = params.get("divide") or [5, 2]
+    low, high = params.get("extent") or extent
+    span = (high - low) or abs(low) or 1
+    log_base = math.log(base)
+    if params.get("step"):
+        step = params["step"]
+    elif params.get("steps"):
+        steps = params["steps"]
+        i = 0
+        while i < len(steps) and steps[i] < span / maxbins:
+            i += 1
+        step = steps[max(0, i - 1)]
+    else:
+        level = math.ceil(math.log(maxbins) / log_base)
+        minstep = params.get("minstep") or 0
+        step = max(minstep, base ** (
+            math.floor(math.log(span) / log_base + 0.5) - level))
+        while math.ceil(span / step) > maxbins:
+            step *= base
+        for div in divide:
+            candidate = step / div
+            if candidate >= minstep and span / candidate <= maxbins:
+                step = candidate
+
+    v = math.log(step)
+    precision = 0 if v >= 0 else int(-v / log_base) + 1
+    eps = base ** (-precision - 1)
+    if params.get("nice", True) is not False:
+        v = math.floor(low / step + eps) * step
+        low = v - step if low < v else v
+        high = math.ceil(high / step) * step
+    stop = low + step if high == low else high
+
+    start = low
+    end = start + math.ceil((stop - start) / step) * step
+    anchor = params.get("anchor")
+    if anchor is not None:
+        shift = anchor - (start + step * math.floor((anchor - start) / step))
+        start += shift
+        end += shift
+    return start, end, step
+
+
+def _bin_midpoints(values, params):
+    """Return the middle of each value's bin and the data extent, or None
+    if there is no value to bin"""
+    valid = values[~np.isnan(values)]
+    if not len(valid):
+        return None
+    extent = [float(valid.min()), float(valid.max())]
+    start, end, step = _bins(params, extent)
+    clipped = np.clip(values, start, end - step)
+    bins = start + step * np.floor(_BIN_EPSILON + (clipped - start) / step)
+    bins[values < start] = -np.inf
+    bins[values > end] = np.inf
+    return bins + step / 2, extent
+
+
+# --- aggregate -------------------------------------------------------------
+
+def _aggregate(frame, keys, measures):
+    """Group `frame` by `keys` and compute `measures`.
+
+    keys :
+        `[(name, values), ...]`; groups keep their first-seen order, as in
+        Vega, and missing values form a group
+
+    measures :
+        `[(op, field, name), ...]`
+    """
+    if keys:
+        by = [pd.Series(values, index=frame.index, name=name)
+              for name, values in keys]
+    else:
+        by = np.zeros(len(frame), dtype=np.int8)
+    grouped = frame.groupby(by, sort=False, dropna=False, observed=True)
+    columns = []
+    for op, field, name in measures:
+        if op == "count":
+            column = grouped.size()
+        else:
+            column = _OPS[op](grouped[field])
+        columns.append(column.rename(name))
+    result = pd.concat(columns, axis=1)
+    if keys:
+        return result.reset_index()
+    return result.reset_index(drop=True)
+
+
+def _check_measure(frame, op, field):
+    if op == "count":
+        return True
+    if op not in _OPS or field not in frame.columns:
+        return False
+    return op in _COUNTING or frame[field].dtype.kind in "iuf"
+
+
+def _aggregate_transform(frame, transform):
+    """Evaluate an `aggregate` transform, or return None"""
+    if set(transform) - {"aggregate", "groupby"}:
+        return None
+    groupby = transform.get("groupby", [])
+    measures = []
+    for spec in transform["aggregate"]:
+        op, field, name = spec.get("op"), spec.get("field"), spec.get("as")
+        if not isinstance(name, str) or not _check_measure(frame, op, field):
+            return None
+        measures.append((op, field, name))
+    if not all(isinstance(key, str) and key in frame.columns
+               for key in groupby):
+        return None
+    return _aggregate(frame, [(key, frame[key]) for key in groupby],
+                      measures)
+
+
+# --- density ---------------------------------------------------------------
+
+def _bandwidth(values):
+    """Scott's rule, as Vega's `bandwidthNRD`"""
+    n = len(values)
+    deviation = float(np.std(values, ddof=1)) if n > 1 else math.nan
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    spread = (q3 - q1) / 1.34
+    smaller = min(deviation, spread) if n > 1 else math.nan
+    return 1.06 * _js_or(smaller, deviation, abs(q1), 1) * n ** -0.2
+
+
+def _cumulative_normal(z):
+    """Vega's `cumulativeNormal` (Hart's approximation, after West)"""
+    absolute = np.abs(z)
+    exp = np.exp(-absolute * absolute / 2)
+    num = 3.52624965998911e-02 * absolute + 0.700383064443688
+    for coefficient in (6.37396220353165, 33.912866078383,
+                        112.079291497871, 221.213596169931,
+                        220.206867912376):
+        num = num * absolute + coefficient
+    den = 8.83883476483184e-02 * absolute + 1.75566716318264
+    for coefficient in (16.064177579207, 86.7807322029461,
+                        296.564248779674, 637.333633378831,
+                        793.826512519948, 440.413735824752):
+        den = den * absolute + coefficient
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tail = absolute + 0.65
+        for k in (4, 3, 2, 1):
+            tail = absolute + k / tail
+        cd = np.where(absolute < 7.07106781186547, exp * num / den,
+                      exp / tail / 2.506628274631)
+    cd = np.where(absolute > 37, 0.0, cd)
+    return np.where(z > 0, 1 - cd, cd)
+
+
+def _kde(values, bandwidth, cumulative):
+    """Return the density (or distribution) function of `values`"""
+    n = len(values)
+    chunk = max(1, _CHUNK // n)
+
+    def f(xs):
+        out = np.empty(len(xs))
+        for i in range(0, len(xs), chunk):
+            z = np.subtract(xs[i:i + chunk, None], values[None, :])
+            z /= bandwidth
+            if cumulative:
+                out[i:i + chunk] = _cumulative_normal(z).sum(axis=1)
+            else:
+                z *= z
+                z *= -0.5
+                out[i:i + chunk] = np.exp(z, out=z).sum(axis=1)
+        if cumulative:
+            return out / n
+        return out / _SQRT_2PI / bandwidth / n
+
+    return f
+
+
+def _angle_delta(p, q, r, sx, sy):
+    a0 = math.atan2(sy * (r[1] - p[1]), sx * (r[0] - p[0]))
+    a1 = math.atan2(sy * (q[1] - p[1]), sx * (q[0] - p[0]))
+    return abs(a0 - a1)
+
+
+def _sample_curve(f, extent, min_steps, max_steps):
+    """Vega's `sampleCurve`: sample `f` more finely where it bends"""
+    low, high = extent
+    span = high - low
+    if min_steps == max_steps:
+        xs = [low] + [low + i / min_steps * span
+                      for i in range(1, max_steps)] + [high]
+        return list(zip(xs, f(np.array(xs)).tolist()))
+
+    xs = [low, high] + [low + i / min_steps * span
+                        for i in range(min_steps - 1, 0, -1)]
+    points = list(zip(xs, f(np.array(xs)).tolist()))
+    done, stack = points[:1], points[1:]
+    stop = span / max_steps
+    ys = [y for _, y in points]
+    y_span = max(ys) - min(ys)
+    sx = 1 / span
+    sy = 1 / y_span if y_span else math.inf
+    p0 = done[0]
+    while stack:
+        p1 = stack[-1]
+        xm = (p0[0] + p1[0]) / 2
+        pm = (xm, float(f(np.array([xm]))[0]))
+        if pm[0] - p0[0] >= stop and \
+                _angle_delta(p0, pm, p1, sx, sy) > _MIN_RADIANS:
+            stack.append(pm)
+        else:
+            p0 = p1
+            done.append(p1)
+            stack.pop()
+    return done
+
+
+def _density_transform(frame, transform):
+    """Evaluate a `density` transform, or return None"""
+    if set(transform) - _DENSITY_PARAMS:
+        return None
+    field = transform["density"]
+    groupby = transform.get("groupby", [])
+    if not all(isinstance(key, str) and key in frame.columns
+               for key in [field] + groupby):
+        return None
+    values = _numeric(frame[field])
+    # Vega would take missing values as 0 in the kernel sums
+    if values is None or np.isnan(values).any():
+        return None
+    value_name, density_name = transform.get("as", ["value", "density"])
+    steps = transform.get("steps")
+    min_steps = steps or transform.get("minsteps") or 25
+    max_steps = max(min_steps, steps or transform.get("maxsteps") or 200)
+
+    if groupby:
+        numbers = frame.groupby([frame[key] for key in groupby], sort=False,
+                                dropna=False, observed=True).ngroup()
+        numbers = numbers.to_numpy()
+        if (numbers < 0).any():
+            return None
+    else:
+        numbers = np.zeros(len(frame), dtype=int)
+    rows = []
+    # Groups in first-seen order, as Vega's
+    for number in range(numbers.max() + 1):
+        index = np.flatnonzero(numbers == number)
+        group = values[index]
+        dims = [frame[key].iat[index[0]] for key in groupby]
+        f = _kde(group, transform.get("bandwidth") or _bandwidth(group),
+                 transform.get("cumulative", False))
+        scale = len(group) if transform.get("counts") else 1
+        extent = transform.get("extent") or [float(group.min()),
+                                             float(group.max())]
+        for x, y in _sample_curve(f, extent, min_steps, max_steps):
+            row = dict(zip(groupby, dims))
+            row[value_name] = x
+            row[density_name] = y * scale
+            rows.append(row)
+    return pd.DataFrame(rows, columns=groupby + [value_name, density_name])
+
+
+# --- encoding --------------------------------------------------------------
+
+def _definitions(encoding):
+    for channel, value in encoding.items():
+        for definition in value if isinstance(value, list) else [value]:
+            yield channel, definition
+
+
+def _title(op, field, config):
+    """Vega-Lite's default ("verbal") title of an aggregated field"""
+    if op == "count":
+        return config.get("countTitle", "Count of Records")
+    return f"{op[0].upper()}{op[1:]} of {field}"
+
+
+def _reduce_encoding(frame, encoding, config):
+    """Return `(frame, encoding)` reduced to one row per mark, or None"""
+    keys = {}        # field -> bin parameters, or None if not binned
+    measures = []    # [(op, field), ...]
+    for channel, definition in _definitions(encoding):
+        if not isinstance(definition, dict):
+            return None
+        if {"condition", "timeUnit", "impute"} & set(definition) or \
+                isinstance(definition.get("sort"), dict):
+            return None
+        field = definition.get("field")
+        if field is not None and (not isinstance(field, str)
+                                  or field not in frame.columns):
+            return None
+        op = definition.get("aggregate")
+        bin_ = definition.get("bin")
+        if op is not None:
+            if bin_ or not isinstance(op, str) or \
+                    not _check_measure(frame, op, field):
+                return None
+            if (op, field) not in measures:
+                measures.append((op, field))
+        elif field is not None:
+            if bin_ is None or bin_ is False:
+                params = None
+            elif bin_ is True or isinstance(bin_, dict) and \
+                    not set(bin_) - _BIN_PARAMS:
+                if channel in _NO_BIN_CHANNELS or \
+                        _numeric(frame[field]) is None:
+                    return None
+                params = dict(bin_) if isinstance(bin_, dict) else {}
+                params.setdefault("maxbins", _MAX_BINS.get(channel, 10))
+            else:
+                return None
+            if keys.setdefault(field, params) != params:
+                return None
+
+    if not measures:
+        columns = list(keys)
+        if not columns or len(columns) == len(frame.columns):
+            return None
+        return frame[columns], None
+
+    if "fieldTitle" in config and config["fieldTitle"] != "verbal":
+        return None
+    names = {}
+    fields = [field for _, field in measures]
+    for op, field in measures:
+        if op in _IDEMPOTENT and field not in keys and \
+                fields.count(field) == 1:
+            names[op, field] = field
+        else:
+            names[op, field] = "__count" if field is None \
+                else f"{op}_{field}"
+    if len(set(names.values()) | set(keys)) != len(names) + len(keys):
+        return None
+
+    key_values = []
+    extents = {}
+    for field, params in keys.items():
+        if params is None:
+            key_values.append((field, frame[field]))
+            continue
+        binned = _bin_midpoints(_numeric(frame[field]), params)
+        if binned is None:
+            return None
+        key_values.append((field, binned[0]))
+        extents[field] = binned[1]
+    reduced = _aggregate(frame, key_values,
+                         [(op, field, names[op, field])
+                          for op, field in measures])
+
+    def rewrite(definition):
+        definition = dict(definition)
+        field = definition.get("field")
+        op = definition.get("aggregate")
+        if op is not None and names[op, field] != field:
+            definition.setdefault("title", _title(op, field, config))
+            definition.update(field=names[op, field], aggregate="max")
+        elif op is None and field in extents and \
+                "extent" not in keys[field]:
+            bin_ = definition["bin"]
+            definition["bin"] = dict(bin_ if isinstance(bin_, dict) else {},
+                                     extent=extents[field])
+        return definition
+
+    rewritten = {}
+    for channel, value in encoding.items():
+        if isinstance(value, list):
+            rewritten[channel] = [rewrite(item) for item in value]
+        else:
+            rewritten[channel] = rewrite(value)
+    return reduced, rewritten
+
+
+# --- chart -----------------------------------------------------------------
+
+def _to_dict(obj):
+    return obj if isinstance(obj, dict) else obj.to_dict(validate=False)
+
+
+def pushdown(chart):
+    """Return a copy of `chart` whose data holds the rows Vega-Lite would
+    compute from it, or `chart` itself if it cannot be reduced"""
+    import altair as alt
+
+    frame = chart.data
+    if not isinstance(frame, pd.DataFrame) or not len(frame) or \
+            not all(isinstance(name, str) for name in frame.columns):
+        return chart
+    mark = chart.mark
+    if not isinstance(mark, str) and mark is not alt.Undefined:
+        mark = _to_dict(mark).get("type")
+    if mark in _COMPOSITE_MARKS:
+        return chart
+    if chart.selection is not alt.Undefined and any(
+            _to_dict(selection).get("bind") != "scales"
+            for selection in chart.selection.values()):
+        return chart
+
+    transforms = [] if chart.transform is alt.Undefined else \
+        [_to_dict(transform) for transform in chart.transform]
+    done = 0
+    for transform in transforms:
+        if "density" in transform:
+            result = _density_transform(frame, transform)
+        elif "aggregate" in transform:
+            result = _aggregate_transform(frame, transform)
+        else:
+            break
+        if result is None:
+            break
+        frame = result
+        done += 1
+
+    encoding = None
+    if done == len(transforms) and chart.encoding is not alt.Undefined:
+        config = {} if chart.config is alt.Undefined else \
+            _to_dict(chart.config)
+        # Shorthand types are inferred from the chart's own data, as
+        # altair does
+        result = _reduce_encoding(
+            frame,
+            chart.encoding.to_dict(validate=False,
+                                   context={"data": chart.data}),
+            config)
+        if result is not None:
+            frame, encoding = result
+    if frame is chart.data:
+        return chart
+
+    copy = chart.copy(deep=False)
+    copy.data = frame
+    copy.transform = transforms[done:] or alt.Undefined
+    if encoding is not None:
+        copy.encoding = alt.FacetedEncoding(**encoding)
+    return copy
+
+
+# The last chart rewritten, as `save_chart` serializes a chart twice (for
+# its cache key, then to write it): (weakref, ids of its parts, result)
+_last = (None, None, None)
+
+
+def _parts(chart):
+    return tuple(id(part) for part in (chart.data, chart.mark,
+                                       chart.encoding, chart.transform))
+
+
+def _cached_pushdown(chart):
+    global _last
+    ref, parts, result = _last
+    if ref is not None and ref() is chart and parts == _parts(chart):
+        return chart if result is None else result
+    result = pushdown(chart)
+    _last = (weakref.ref(chart), _parts(chart),
+             None if result is chart else result)
+    return result
+
+
+def preaggregate(data, max_rows=5000):
+    """The registered data transformer: altair's default one, applied to
+    the data `pushdown` has left"""
+    import altair as alt
+    return alt.default_data_transformer(data, max_rows=max_rows)
+
+
+_chart_to_dict = None
+
+
+def register():
+    """Register the "preaggregate" data transformer"""
+    global _chart_to_dict
+    if _chart_to_dict is not None:
+        return
+    import altair as alt
+    _chart_to_dict = alt.Chart.to_dict
+
+    def to_dict(self, *args, **kwargs):
+        if alt.data_transformers.active == NAME:
+            self = _cached_pushdown(self)
+        return _chart_to_dict(self, *args, **kwargs)
+
+    alt.Chart.to_dict = to_dict
+    alt.data_transformers.register(NAME, preaggregate)
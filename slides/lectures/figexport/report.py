@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Size and load-time report for a directory of exported plotly pages.
+
+Compares the pages as written, sharing one plotly.js bundle, with the
+same pages inlining the bundle as `plotly.offline.plot` does. Load times
+are transfer-time estimates at a given bandwidth, with the shared bundle
+fetched by the first page and served from the browser cache afterwards.
+
+    cd slides/lectures
+    python -m figexport.report week6/img [--mbps 10]
+"""
+
+import argparse
+import glob
+import os
+import re
+
+_BUNDLE_RE = re.compile(r'<script src="(plotly-[^"]+\.min\.js)"')
+
+
+def size_report(directory, mbps=10.0):
+    """Return the byte counts and estimated load times (in seconds)"""
+    bytes_per_second = mbps * 1e6 / 8
+    bundle_sizes = {}
+    page_sizes = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            match = _BUNDLE_RE.search(f.read(4096))
+        if match is None:
+            continue
+        bundle = match.group(1)
+        if bundle not in bundle_sizes:
+            bundle_sizes[bundle] = os.path.getsize(
+                os.path.join(directory, bundle))
+        page_sizes.append((os.path.getsize(path), bundle_sizes[bundle]))
+
+    shared = sum(page for page, _ in page_sizes) + sum(bundle_sizes.values())
+    inlined = sum(page + bundle for page, bundle in page_sizes)
+    pages = len(page_sizes)
+    first_page = sum(page_sizes[0]) if pages else 0
+    return {
+        "pages": pages,
+        "bytes_inlined": inlined,
+        "bytes_shared": shared,
+        "bytes_saved": inlined - shared,
+        "load_s_inlined_per_page":
+            inlined / pages / bytes_per_second if pages else 0.0,
+        "load_s_shared_first_page": first_page / bytes_per_second,
+        "load_s_shared_deck": shared / bytes_per_second,
+        "load_s_inlined_deck": inlined / bytes_per_second,
+    }
+
+
+def format_report(report, directory):
+    mb = 1e6
+    return "\n".join([
+        f"{directory}: {report['pages']} plotly pages",
+        f"  size inlined : {report['bytes_inlined'] / mb:8.1f} MB",
+        f"  size shared  : {report['bytes_shared'] / mb:8.1f} MB",
+        f"  saved        : {report['bytes_saved'] / mb:8.1f} MB",
+        f"  deck load    : {report['load_s_inlined_deck']:8.1f} s inlined,"
+        f" {report['load_s_shared_deck']:.1f} s shared",
+        f"  page load    : {report['load_s_inlined_per_page']:8.2f} s inlined,"
+        f" {report['load_s_shared_first_page']:.2f} s for the first shared"
+        f" page",
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directories", nargs="+")
+    parser.add_argument("--mbps", type=float, default=10.0,
+                        help="bandwidth used for the load time estimates")
+    args = parser.parse_args(argv)
+    for directory in args.directories:
+        print(format_report(size_report(directory, args.mbps), directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Batch static (PNG/SVG/PDF) export of plotly figures through a pool of
+warm renderer processes.
+
+`fig.write_image` renders through a single orca server (or kaleido
+subprocess) per Python process, started on first use. Here a few worker
+processes each start their renderer once and are then fed figures:
+
+    from figexport.static import ExportPool
+
+    with ExportPool(workers=3) as pool:
+        for fig, filename in figures:
+            pool.submit(fig, filename)
+    print(pool.stats())
+
+- Backpressure: `submit` blocks while `max_pending` figures are waiting
+  for a free worker, so a script building figures faster than they are
+  rendered does not hold them all in memory.
+- Crash recovery: a worker that dies or exceeds `timeout` is restarted
+  and its figure is requeued, up to `retries` times; figures that still
+  fail are listed in `pool.failed` instead of aborting the batch.
+- Figures whose output is unchanged are skipped (see `figexport.cache`).
+"""
+
+import collections
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+from .cache import default_cache, plotly_key
+
+_Task = collections.namedtuple(
+    "_Task", ["id", "fig_json", "filename", "format", "kwargs", "key",
+              "attempts"])
+
+
+def _default_engine():
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        return "orca"
+    return "kaleido"
+
+
+def _worker_main(conn, engine):
+    """Render loop of a worker process"""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    # Start the renderer before the first real figure arrives
+    pio.to_image(go.Figure(), format="png", engine=engine)
+    conn.send(("ready", None))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        task_id, fig_json, filename, fmt, kwargs = task
+        try:
+            fig = pio.from_json(fig_json)
+            tmp_path = f"{filename}.{os.getpid()}.tmp"
+            pio.write_image(fig, tmp_path, format=fmt, engine=engine,
+                            **kwargs)
+            os.replace(tmp_path, filename)
+        except Exception as exc:
+            conn.send((task_id, f"{type(exc).__name__}: {exc}"))
+        else:
+            conn.send((task_id, None))
+
+
+class _Worker(object):
+
+    def __init__(self, context, engine):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, engine),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.started = time.monotonic()
+        self.task = None
+        self.deadline = None
+
+    def send(self, task, timeout):
+        self.task = task
+        self.deadline = None if timeout is None else \
+            time.monotonic() + timeout
+        self.conn.send(task[:5])
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+class ExportPool(object):
+    """Pool of warm static-image renderers.
+
+    workers :
+        number of renderer processes
+
+    max_pending :
+        figures that may wait for a worker before `submit` blocks
+        (default: 4 per worker)
+
+    engine :
+        "orca" or "kaleido"; defaults to kaleido when installed
+
+    retries :
+        restarts allowed per figure after its worker crashed
+
+    timeout :
+        seconds a worker may spend on one figure (including starting
+        its renderer) before it is killed and restarted
+    """
+
+    def __init__(self, workers=2, max_pending=None, engine=None, retries=1,
+                 timeout=120, cache=default_cache):
+        self.engine = engine or _default_engine()
+        self.max_pending = max_pending or 4 * workers
+        self.retries = retries
+        self.timeout = timeout
+        self.cache = cache
+        self.failed = {}
+        self.written = 0
+        self.skipped = 0
+        self.restarts = 0
+        self._startup_failures = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._size = workers
+        # Started with the first figure that is not already up to date
+        self._workers = []
+        self._backlog = collections.deque()
+        self._next_id = 0
+        self._start = time.perf_counter()
+        self._end = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, fig, filename, format=None, **kwargs):
+        """Queue `fig` for export to `filename`; returns False if the file
+        is already up to date"""
+        fmt = format or os.path.splitext(filename)[1].lstrip(".") or "png"
+        fig_json = fig if isinstance(fig, str) else fig.to_json()
+        key = None if self.cache is None else \
+            plotly_key(fig_json, format=fmt, **kwargs)
+        if self.cache is not None and self.cache.is_current(filename, key):
+            self.cache.record(filename, key)
+            self.skipped += 1
+            return False
+
+        filename = os.path.abspath(filename)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        if not self._workers:
+            self._workers = [_Worker(self._context, self.engine)
+                             for _ in range(self._size)]
+        self._next_id += 1
+        self._backlog.append(_Task(self._next_id, fig_json, filename, fmt,
+                                   kwargs, key, 0))
+        self._dispatch()
+        while len(self._backlog) >= self.max_pending:
+            self._poll(None)
+        return True
+
+    def close(self, drain=True):
+        """Wait for all queued figures, then stop the workers"""
+        while drain and (self._backlog or
+                         any(w.task for w in self._workers)):
+            self._poll(1.0)
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def stats(self):
+        seconds = (self._end or time.perf_counter()) - self._start
+        return {
+            "written": self.written,
+            "skipped": self.skipped,
+            "failed": len(self.failed),
+            "restarts": self.restarts,
+            "seconds": seconds,
+            "figures_per_second": self.written / seconds if seconds else 0.0,
+        }
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self._backlog:
+                break
+            if worker.ready and worker.task is None:
+                worker.send(self._backlog.popleft(), self.timeout)
+
+    def _restart(self, worker):
+        task = worker.task
+        if not worker.ready:
+            self._startup_failures += 1
+            if self._startup_failures > 2 * len(self._workers):
+                self.close(drain=False)
+                raise RuntimeError(
+                    f"the {self.engine} renderer failed to start; check "
+                    f"that it is installed (fig.write_image shows the "
+                    f"error)")
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        self._workers[self._workers.index(worker)] = \
+            _Worker(self._context, self.engine)
+        self.restarts += 1
+        if task is not None:
+            if task.attempts < self.retries:
+                self._backlog.appendleft(task._replace(
+                    attempts=task.attempts + 1))
+            else:
+                self.failed[task.filename] = "renderer crashed or timed out"
+
+    def _finish(self, worker, task_id, error):
+        task = worker.task
+        worker.task = None
+        if task is None or task.id != task_id:
+            return
+        if error is not None:
+            self.failed[task.filename] = error
+        else:
+            self.written += 1
+            if self.cache is not None:
+                self.cache.record(task.filename, task.key)
+
+    def _poll(self, timeout):
+        """Handle worker messages and crashes, then hand out figures"""
+        now = time.monotonic()
+        deadlines = [w.deadline for w in self._workers
+                     if w.task is not None and w.deadline is not None]
+        # A renderer that hangs while starting must not block `submit`
+        if self.timeout is not None:
+            deadlines += [w.started + self.timeout for w in self._workers
+                          if not w.ready]
+        if deadlines:
+            until_deadline = max(0.0, min(deadlines) - now)
+            timeout = until_deadline if timeout is None else \
+                min(timeout, until_deadline)
+        by_handle = {}
+        for worker in self._workers:
+            by_handle[worker.conn] = worker
+            by_handle[worker.process.sentinel] = worker
+        crashed = []
+        for handle in wait(list(by_handle), timeout):
+            worker = by_handle[handle]
+            if handle is worker.conn:
+                try:
+                    message, error = worker.conn.recv()
+                except (EOFError, OSError):
+                    crashed.append(worker)
+                    continue
+                if message == "ready":
+                    worker.ready = True
+                else:
+                    self._finish(worker, message, error)
+            elif not worker.conn.poll():
+                crashed.append(worker)
+        now = time.monotonic()
+        for worker in self._workers:
+            if worker.task is not None and worker.deadline is not None \
+                    and now > worker.deadline:
+                crashed.append(worker)
+            elif not worker.ready and self.timeout is not None and \
+                    now > worker.started + self.timeout:
+                crashed.append(worker)
+        for worker in set(crashed):
+            self._restart(worker)
+        self._dispatch()
+
+
+def export_all(figures, workers=2, **kwargs):
+    """Export `(fig, filename)` pairs with an `ExportPool`; returns the
+    pool's stats and failures"""
+    pool = ExportPool(workers=workers, **kwargs)
+    with pool:
+        for fig, filename in figures:
+            pool.submit(fig, filename)
+    result = pool.stats()
+    result["failures"] = dict(pool.failed)
+    return result
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+from figexport import cache
+
+
+@pytest.fixture
+def figure_cache(monkeypatch):
+    figure_cache = cache.FigureCache()
+    monkeypatch.setattr(cache, "default_cache", figure_cache)
+    yield figure_cache
+    figure_cache.flush()
+
+
+def test_savefig_explicit_format(tmp_path, figure_cache):
+    pytest.importorskip("matplotlib")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    fig.add_subplot().plot([1, 2, 3])
+    filename = str(tmp_path / "plot.out")
+    assert cache.savefig(fig, filename, format="png", dpi=50)
+    with open(filename, "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+    assert not cache.savefig(fig, filename, format="png", dpi=50)
+    assert cache.savefig(fig, filename, format="svg", dpi=50)
+
+
+def test_save_chart_explicit_format(tmp_path, figure_cache):
+    alt = pytest.importorskip("altair")
+
+    chart = alt.Chart(alt.Data(values=[{"a": 1}])).mark_point().encode(
+        x="a:Q")
+    filename = str(tmp_path / "chart.vl")
+    assert cache.save_chart(chart, filename, format="json")
+    assert not cache.save_chart(chart, filename, format="json")
+    assert cache.save_chart(chart, filename, format="html")
+
+
+def test_manifest_saved_once_and_not_for_hits(tmp_path, figure_cache):
+    manifest = tmp_path / cache.MANIFEST
+
+    def writer(path):
+        with open(path, "w") as f:
+            f.write(path)
+
+    for i in range(3):
+        figure_cache.write(str(tmp_path / f"{i}.txt"), str(i), writer)
+    assert not manifest.exists()
+    figure_cache.flush()
+    saved = manifest.read_text()
+
+    # Re-running with unchanged figures only refreshes their `used` time
+    rerun = cache.FigureCache()
+    for i in range(3):
+        assert not rerun.write(str(tmp_path / f"{i}.txt"), str(i), writer)
+    manifest.unlink()
+    rerun.flush()
+    assert not manifest.exists()
+
+    assert rerun.write(str(tmp_path / "0.txt"), "changed", writer)
+    rerun.flush()
+    assert manifest.read_text() != saved
+
+
+def test_evicts_least_recently_used(tmp_path, figure_cache):
+    figure_cache.max_entries = 2
+    for name in ("a", "b", "c", "a"):
+        figure_cache.write(str(tmp_path / name), name,
+                           lambda path: open(path, "w").close())
+    figure_cache.flush()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        cache.MANIFEST, "a", "c"]
+
+
+def test_hit_refreshes_old_use(tmp_path, figure_cache):
+    filename = str(tmp_path / "a.txt")
+    figure_cache.write(filename, "a", lambda path: open(path, "w").close())
+    figure_cache.flush()
+    manifest = tmp_path / cache.MANIFEST
+    entries = json.loads(manifest.read_text())
+    entries["a.txt"]["used"] -= cache.TOUCH_INTERVAL + 1
+    manifest.write_text(json.dumps(entries))
+
+    rerun = cache.FigureCache()
+    assert not rerun.write(filename, "a", None)
+    rerun.flush()
+    used = json.loads(manifest.read_text())["a.txt"]["used"]
+    assert used > entries["a.txt"]["used"] + cache.TOUCH_INTERVAL
+
+
+def test_scripts_sharing_a_directory(tmp_path, figure_cache):
+    def writer(path):
+        open(path, "w").close()
+
+    first, second = cache.FigureCache(), cache.FigureCache()
+    first.write(str(tmp_path / "old.txt"), "old", writer)
+    first.flush()
+    # Both scripts read the manifest, then write different figures
+    assert not first.is_current(str(tmp_path / "a.txt"), "a")
+    assert not second.is_current(str(tmp_path / "b.txt"), "b")
+    first.write(str(tmp_path / "a.txt"), "a", writer)
+    second.write(str(tmp_path / "b.txt"), "b", writer)
+    second.flush()
+    first.flush()
+    entries = json.loads((tmp_path / cache.MANIFEST).read_text())
+    assert sorted(entries) == ["a.txt", "b.txt", "old.txt"]
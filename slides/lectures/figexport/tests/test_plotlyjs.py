@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+go = pytest.importorskip("plotly.graph_objects")
+
+from figexport import cache, plotlyjs  # noqa: E402
+
+
+@pytest.mark.parametrize("size", [10, 1000])
+def test_write_html_config(tmp_path, monkeypatch, size):
+    monkeypatch.setattr(plotlyjs, "default_cache", cache.FigureCache())
+    fig = go.Figure(go.Scatter(y=np.arange(float(size))))
+    filename = tmp_path / "fig.html"
+    assert plotlyjs.write_html(fig, str(filename),
+                               config={"displaylogo": False})
+    page = filename.read_text()
+    assert plotlyjs.bundle_name() in page
+    assert ('"bdata"' in page) == (size >= 1000)
+    assert '"displaylogo": false' in page
+    assert plotlyjs.write_html(fig, str(filename),
+                               config={"displaylogo": True})
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+alt = pytest.importorskip("altair")
+
+from figexport import preaggregate  # noqa: E402
+
+
+@pytest.fixture
+def mpg():
+    rng = np.random.default_rng(0)
+    rows = 400
+    return pd.DataFrame({
+        "mpg": np.round(rng.normal(23, 7, rows).clip(9, 46), 1),
+        "cylinders": rng.choice([4, 6, 8], rows),
+        "horsepower": np.round(rng.normal(100, 35, rows).clip(46, 230)),
+        "origin": rng.choice(["usa", "japan", "europe"], rows),
+    })
+
+
+# (start, end, step) as computed by Vega's `bin()`
+@pytest.mark.parametrize("params, extent, expected", [
+    ({"maxbins": 10}, [9, 46.6], (5, 50, 5)),
+    ({"maxbins": 20}, [46, 230], (40, 230, 10)),
+    ({"maxbins": 10}, [0, 10], (0, 10, 1)),
+    ({"maxbins": 10}, [3, 3], (3, 3.5, 0.5)),
+    ({"maxbins": 10, "extent": [0, 100]}, [9, 46.6], (0, 100, 10)),
+    ({"maxbins": 10, "nice": False}, [0.5, 9.7], (0.5, 10.5, 1)),
+    ({"step": 7, "anchor": 1}, [46, 230], (43, 232, 7)),
+    ({"maxbins": 10, "steps": [1, 5, 20]}, [0, 100], (0, 100, 5)),
+])
+def test_bins(params, extent, expected):
+    assert preaggregate._bins(params, extent) == pytest.approx(expected)
+
+
+def spec(chart):
+    chart = preaggregate.pushdown(chart)
+    return chart.data, chart.to_dict()
+
+
+def test_average(mpg):
+    data, result = spec(alt.Chart(mpg).mark_bar().encode(
+        x="cylinders:O", y="average(mpg):Q"))
+    expected = mpg.groupby("cylinders", sort=False)["mpg"].mean()
+    assert list(data.columns) == ["cylinders", "mpg"]
+    assert dict(zip(data.cylinders, data.mpg)) == \
+        pytest.approx(expected.to_dict())
+    assert result["encoding"]["y"] == {"aggregate": "average",
+                                       "field": "mpg", "type": "quantitative"}
+
+
+def test_histogram(mpg):
+    data, result = spec(alt.Chart(mpg).mark_bar().encode(
+        x=alt.X("mpg:Q", bin=True), y="count()"))
+    assert data.__count.sum() == len(mpg)
+    # Bins of 5 from 5, marked by their middle
+    assert sorted(data.mpg) == [7.5 + 5 * i for i in range(len(data))]
+    x, y = result["encoding"]["x"], result["encoding"]["y"]
+    assert x["bin"] == {"extent": [mpg.mpg.min(), mpg.mpg.max()]}
+    assert y == {"aggregate": "max", "field": "__count",
+                 "title": "Count of Records", "type": "quantitative"}
+
+
+def test_binned_heatmap(mpg):
+    data, result = spec(alt.Chart(mpg).mark_rect().encode(
+        alt.X("mpg:Q", bin=alt.Bin(maxbins=20)),
+        alt.Y("horsepower:Q", bin=True), alt.Color("count():Q")))
+    assert data.__count.sum() == len(mpg)
+    assert not data.duplicated(["mpg", "horsepower"]).any()
+    assert result["encoding"]["x"]["bin"]["maxbins"] == 20
+    assert result["encoding"]["y"]["bin"]["extent"] == \
+        [mpg.horsepower.min(), mpg.horsepower.max()]
+
+
+def test_transform_aggregate(mpg):
+    data, result = spec(alt.Chart(mpg).transform_aggregate(
+        m="mean(mpg)", groupby=["origin"]).mark_bar().encode(
+        x="origin:N", y="m:Q"))
+    assert "transform" not in result
+    expected = mpg.groupby("origin", sort=False)["mpg"].mean()
+    assert dict(zip(data.origin, data.m)) == \
+        pytest.approx(expected.to_dict())
+
+
+def test_density(mpg):
+    data, result = spec(alt.Chart(mpg).transform_density(
+        density="mpg", as_=["mpg", "density"]).mark_area().encode(
+        alt.X("mpg:Q"), alt.Y("density:Q")))
+    assert "transform" not in result
+    assert list(data.columns) == ["mpg", "density"]
+    assert data.mpg.iat[0] == mpg.mpg.min()
+    assert data.mpg.iat[-1] == mpg.mpg.max()
+    assert np.all(np.diff(data.mpg) > 0)
+    assert 25 <= len(data) <= 200
+
+
+def test_grouped_density_extent(mpg):
+    # The violin plots of week 4. Vega-Lite compiles the transform to a
+    # Vega `kde` without `resolve`, whose default ("independent") samples
+    # each group over its own extent
+    data, _ = spec(alt.Chart(mpg).transform_density(
+        "mpg", as_=["mpg", "density"], groupby=["origin"]).mark_area(
+        orient="horizontal").encode(
+        y="mpg:Q", x=alt.X("density:Q", stack="center", impute=None),
+        color="origin:N", column="origin:N"))
+    assert list(data.origin.unique()) == list(mpg.origin.unique())
+    for origin, curve in data.groupby("origin", sort=False):
+        group = mpg.mpg[mpg.origin == origin]
+        assert curve.mpg.min() == group.min()
+        assert curve.mpg.max() == group.max()
+        bandwidth = preaggregate._bandwidth(group.to_numpy())
+        f = preaggregate._kde(group.to_numpy(), bandwidth, False)
+        assert curve.density.to_numpy() == \
+            pytest.approx(f(curve.mpg.to_numpy()))
+
+    data, _ = spec(alt.Chart(mpg).transform_density(
+        "mpg", as_=["mpg", "density"], groupby=["origin"],
+        extent=[5, 50]).mark_line().encode(
+        x="mpg:Q", y="density:Q", color="origin:N"))
+    for _, curve in data.groupby("origin"):
+        assert [curve.mpg.min(), curve.mpg.max()] == [5, 50]
+
+
+def test_unsupported_chart_is_kept(mpg):
+    chart = alt.Chart(mpg).mark_boxplot().encode(x="origin:N", y="mpg:Q")
+    assert preaggregate.pushdown(chart) is chart
+    chart = alt.Chart(mpg).transform_filter("datum.mpg > 20").mark_bar(
+    ).encode(x="origin:N", y="average(mpg):Q")
+    assert preaggregate.pushdown(chart) is chart
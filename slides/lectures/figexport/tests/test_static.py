@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+from figexport import static
+
+
+def stub_worker(conn, engine):
+    """`static._worker_main` with a renderer that writes the figure JSON
+    as it is; "crash" and "crash-once" figures kill the worker"""
+    if engine == "hang":
+        time.sleep(60)
+    conn.send(("ready", None))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        task_id, fig_json, filename, fmt, kwargs = task
+        marker = filename + ".crashed"
+        if fig_json == "crash" or fig_json == "crash-once" and \
+                not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+        if fig_json == "error":
+            conn.send((task_id, "ValueError: cannot render"))
+            continue
+        with open(filename, "w") as f:
+            f.write(fig_json)
+        conn.send((task_id, None))
+
+
+@pytest.fixture(autouse=True)
+def stub_renderer(monkeypatch):
+    monkeypatch.setattr(static, "_worker_main", stub_worker)
+
+
+def test_export(tmp_path):
+    figures = [(f'{{"n": {i}}}', str(tmp_path / f"{i}.png"))
+               for i in range(6)]
+    with static.ExportPool(workers=2, max_pending=2, engine="stub",
+                           cache=None) as pool:
+        for fig, filename in figures:
+            assert pool.submit(fig, filename)
+        pool.submit("error", str(tmp_path / "error.png"))
+    for fig, filename in figures:
+        with open(filename) as f:
+            assert f.read() == fig
+    assert pool.stats()["written"] == 6
+    assert pool.failed == {str(tmp_path / "error.png"):
+                           "ValueError: cannot render"}
+    assert pool.restarts == 0
+
+
+def test_crashed_worker_is_restarted(tmp_path):
+    with static.ExportPool(workers=1, engine="stub", retries=1,
+                           cache=None) as pool:
+        pool.submit("crash-once", str(tmp_path / "once.png"))
+        pool.submit("crash", str(tmp_path / "always.png"))
+        pool.submit("{}", str(tmp_path / "after.png"))
+    assert (tmp_path / "once.png").read_text() == "crash-once"
+    assert (tmp_path / "after.png").read_text() == "{}"
+    assert list(pool.failed) == [str(tmp_path / "always.png")]
+    assert pool.restarts == 3
+
+
+def test_startup_timeout(tmp_path):
+    pool = static.ExportPool(workers=1, max_pending=1, engine="hang",
+                             timeout=0.5, cache=None)
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="failed to start"):
+        pool.submit("{}", str(tmp_path / "fig.png"))
+    assert time.monotonic() - start < 30
+    assert not pool._workers
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from figexport import typedarray
+
+
+def decode(value):
+    """The page's `decode`, in numpy"""
+    array = np.frombuffer(base64.b64decode(value["bdata"]),
+                          dtype="<" + value["dtype"])
+    return array.reshape(value["shape"])
+
+
+@pytest.mark.parametrize("values, dtype", [
+    ([0, 100, -100], np.int8),
+    ([0, 200], np.uint8),
+    ([-1, 300], np.int16),
+    ([0, 60000], np.uint16),
+    ([-1, 60000], np.int32),
+    ([0, 4000000000], np.uint32),
+    ([-1, 4000000000], np.float64),
+    ([], np.int8),
+])
+def test_downcast_integers(values, dtype):
+    array = np.array(values, dtype=np.int64)
+    result = typedarray.downcast(array)
+    assert result.dtype == dtype
+    assert (result == array).all()
+
+
+@pytest.mark.parametrize("values, dtype", [
+    ([0.1, 2.5, -3.75, np.nan, np.inf], np.float32),
+    ([1.0, 1 + 1e-5], np.float32),
+    ([1e300], np.float64),
+    ([1e-50], np.float64),
+    ([0.0, 1e-30], np.float32),
+])
+def test_downcast_floats(values, dtype):
+    assert typedarray.downcast(np.array(values)).dtype == dtype
+
+
+def test_downcast_display_digits():
+    # rtol is half a unit in the last displayed digit; float32 keeps
+    # about 7 significant digits
+    array = np.array([1.0, 1.0001, 1 + 1e-7])
+    assert typedarray.downcast(array).dtype == np.float32
+    assert typedarray.downcast(array, display_digits=7).dtype == np.float32
+    assert typedarray.downcast(array, display_digits=9).dtype == np.float64
+    assert (typedarray.downcast(array) == array.astype(np.float32)).all()
+
+
+def test_encode_round_trip():
+    rng = np.random.default_rng(0)
+    z = rng.normal(size=(40, 30)).astype(np.float32)
+    x = np.arange(2000)
+    spec = {
+        "data": [
+            {"type": "heatmap", "z": z.tolist(), "name": "expr"},
+            {"type": "scatter", "x": x, "y": (x * 0.5).tolist(),
+             "text": ["a"] * 2000},
+            {"type": "scatter", "x": [1, 2, 3]},
+        ],
+        "layout": {"title": {"text": "t"}},
+    }
+    encoded, count = typedarray.encode(spec)
+    assert count == 3
+    heatmap, scatter, small = encoded["data"]
+    assert heatmap["z"]["dtype"] == "f4"
+    assert heatmap["z"]["shape"] == [40, 30]
+    assert (decode(heatmap["z"]) == z).all()
+    assert scatter["x"]["dtype"] == "i2"
+    assert (decode(scatter["x"]) == x).all()
+    assert (decode(scatter["y"]) == x * 0.5).all()
+    assert scatter["text"] == ["a"] * 2000
+    assert small == {"type": "scatter", "x": [1, 2, 3]}
+    assert encoded["layout"] == spec["layout"]
+    json.dumps(encoded)
+
+
+def test_to_html_escapes_and_config():
+    go = pytest.importorskip("plotly.graph_objects")
+
+    fig = go.Figure(go.Scatter(y=np.arange(1000.0),
+                               name="</script><script>alert(1)"))
+    page = typedarray.to_html(fig, "plotly.min.js",
+                              config={"displaylogo": False})
+    assert page.count("</script>") == 2
+    assert '<\\/script><script>alert(1)' in page
+    assert '{"displaylogo": false, "responsive": true}' in page
+
+    assert typedarray.to_html(fig, "plotly.min.js",
+                              config={"showLink": True}) is None
+    assert typedarray.to_html(go.Figure(go.Scatter(y=[1, 2])),
+                              "plotly.min.js") is None
+    animated = go.Figure(go.Scatter(y=np.arange(1000.0)),
+                         frames=[go.Frame(data=[go.Scatter(y=[1])])])
+    assert typedarray.to_html(animated, "plotly.min.js") is None
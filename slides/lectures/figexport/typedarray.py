@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Write large numeric plotly traces as base64 typed arrays.
+
+By default every value of e.g. a `go.Heatmap` z matrix is written as
+JSON text, so a gene-expression-sized matrix makes a page of tens of MB
+that the browser parses slowly. Here each large numeric array is stored
+as `{"dtype": "f4", "bdata": <base64>, "shape": [rows, cols]}`: about
+5.3 bytes per float32 value instead of ~18 for its decimal text, and
+decoded with `atob` into a typed array instead of being parsed.
+
+plotly.js only understands `bdata` natively from 2.28 on, and the course
+pins plotly 5.1 (plotly.js 2.2), so the page decodes the arrays itself
+before calling `Plotly.newPlot`; plotly.js accepts typed arrays (and
+arrays of typed-array rows for 2D data) in any version.
+
+Float64 data is downcast to float32 when that is lossless for display:
+float32 keeps about 7 significant digits, so values are only downcast if
+they all stay within `display_digits` significant digits of the
+original, are inside the float32 range and do not underflow to zero.
+"""
+
+import base64
+import json
+
+import numpy as np
+
+# Arrays with fewer values stay plain JSON
+MIN_SIZE = 1000
+
+_INT_TYPES = (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32)
+
+_DTYPE_CODES = {
+    np.dtype(np.float32): "f4",
+    np.dtype(np.float64): "f8",
+    np.dtype(np.int8): "i1",
+    np.dtype(np.uint8): "u1",
+    np.dtype(np.int16): "i2",
+    np.dtype(np.uint16): "u2",
+    np.dtype(np.int32): "i4",
+    np.dtype(np.uint32): "u4",
+}
+
+_DECODER = """\
+(function () {
+  var types = {f4: Float32Array, f8: Float64Array, i1: Int8Array,
+               u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+               i4: Int32Array, u4: Uint32Array};
+  function decode(value) {
+    if (value === null || typeof value !== "object") {
+      return value;
+    }
+    if (typeof value.bdata === "string" && types[value.dtype]) {
+      var text = atob(value.bdata), bytes = new Uint8Array(text.length);
+      for (var i = 0; i < text.length; i++) {
+        bytes[i] = text.charCodeAt(i);
+      }
+      var array = new types[value.dtype](bytes.buffer);
+      if (!value.shape || value.shape.length < 2) {
+        return array;
+      }
+      var cols = value.shape[1], rows = [];
+      for (var r = 0; r < value.shape[0]; r++) {
+        rows.push(array.subarray(r * cols, (r + 1) * cols));
+      }
+      return rows;
+    }
+    for (var key in value) {
+      value[key] = decode(value[key]);
+    }
+    return value;
+  }
+  var fig = decode(%(figure)s);
+  Plotly.newPlot("%(div_id)s", fig.data, fig.layout, %(config)s);
+})();"""
+
+_PAGE = """\
+<html>
+<head><meta charset="utf-8" /></head>
+<body>
+<div id="%(div_id)s" class="plotly-graph-div" \
+style="height:100%%; width:100%%;"></div>
+<script src="%(bundle)s"></script>
+<script type="text/javascript">
+%(script)s
+</script>
+</body>
+</html>
+"""
+
+
+def downcast(array, display_digits=6):
+    """Return `array` in the smallest dtype that keeps it displayable"""
+    if array.dtype.kind in "iu":
+        if array.size == 0:
+            return array.astype(np.int8)
+        low, high = array.min(), array.max()
+        for int_type in _INT_TYPES:
+            info = np.iinfo(int_type)
+            if info.min <= low and high <= info.max:
+                return array.astype(int_type)
+        return array.astype(np.float64)
+    array = array.astype(np.float64, copy=False)
+    single = array.astype(np.float32)
+    finite = np.isfinite(array)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lossless = (np.isfinite(single) == finite).all() and np.allclose(
+            single[finite], array[finite],
+            rtol=0.5 * 10.0 ** (1 - display_digits), atol=0) and \
+            not (single[finite] == 0)[array[finite] != 0].any()
+    return single if lossless else array
+
+
+def encode_array(array, display_digits=6):
+    """Return the `{dtype, bdata, shape}` dict for a numeric array"""
+    array = np.ascontiguousarray(downcast(array, display_digits))
+    array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+    return {
+        "dtype": _DTYPE_CODES[np.dtype(array.dtype.name)],
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+        "shape": list(array.shape),
+    }
+
+
+def _is_encodable(value, min_size):
+    return isinstance(value, np.ndarray) and value.dtype.kind in "iuf" \
+        and value.ndim in (1, 2) and value.size >= min_size
+
+
+def encode(value, min_size=MIN_SIZE, display_digits=6):
+    """Replace the large numeric arrays of a figure dict, recursively.
+
+    Returns `(encoded, count)` with the number of arrays replaced.
+    """
+    if isinstance(value, (list, tuple)) and value and \
+            isinstance(value[0], (list, tuple, int, float, np.number)):
+        # e.g. z given as a list of lists
+        try:
+            candidate = np.asarray(value)
+        except ValueError:
+            candidate = None
+        if candidate is not None and _is_encodable(candidate, min_size):
+            value = candidate
+    if _is_encodable(value, min_size):
+        return encode_array(value, display_digits), 1
+    if isinstance(value, dict):
+        count = 0
+        encoded = {}
+        for key, item in value.items():
+            encoded[key], n = encode(item, min_size, display_digits)
+            count += n
+        return encoded, count
+    if isinstance(value, (list, tuple)):
+        count = 0
+        encoded = []
+        for item in value:
+            item, n = encode(item, min_size, display_digits)
+            encoded.append(item)
+            count += n
+        return encoded, count
+    return value, 0
+
+
+def to_html(fig, bundle, config=None, min_size=MIN_SIZE, display_digits=6,
+            div_id="figure"):
+    """Return a full HTML page drawing `fig` with typed-array data, or
+    None if it has no array worth encoding.
+
+    `config` is the plotly.js config, as for `fig.write_html`. Figures
+    with animation frames (the only ones `auto_play` applies to) and
+    configs linking to Chart Studio also give None, and are left to
+    `fig.write_html`.
+    """
+    from plotly.utils import PlotlyJSONEncoder
+
+    config = dict(config or {})
+    if config.get("showLink") or config.get("showSendToCloud"):
+        return None
+    # As `fig.write_html` does without a Chart Studio link
+    for key in ("plotlyServerURL", "linkText", "showLink"):
+        config.pop(key, None)
+    config.setdefault("responsive", True)
+    spec = fig.to_plotly_json()
+    if spec.get("frames"):
+        return None
+    spec = {"data": spec.get("data", []), "layout": spec.get("layout", {})}
+    spec, count = encode(spec, min_size, display_digits)
+    if not count:
+        return None
+    figure = json.dumps(spec, cls=PlotlyJSONEncoder, separators=(",", ":"))
+    script = _DECODER % {
+        # Keep strings such as "</script>" from ending the script early
+        "figure": figure.replace("</", "<\\/"),
+        "div_id": div_id,
+        "config": json.dumps(config).replace("</", "<\\/"),
+    }
+    return _PAGE % {"div_id": div_id, "bundle": bundle, "script": script}
@@ -18,16 +18,8 @@
 # ---
 
 # %%
-import plotly
-from IPython.display import IFrame, display_html
-
-
-def show_fig(fig, filename, width="100%", height=500):
-    plotly.offline.plot(fig, filename=filename, auto_open=False, auto_play=False)
-    display_html(IFrame(filename, height=height, width=width))
-
-def show_fig2(filename, width="100%", height=500):
-    display_html(IFrame(filename, width=width, height=height))
+from figexport import install, show_fig, show_fig2
+install()  # leave unchanged figures untouched
 
 
 
@@ -231,6 +223,8 @@ import plotly.figure_factory as ff
 import plotly.graph_objects as go
 import seaborn as sns
 
+alt.data_transformers.enable('preaggregate')  # aggregate in pandas, embed only the result
+
 # %% [markdown]
 # # plotly
 #
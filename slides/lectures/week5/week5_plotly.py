@@ -30,10 +30,7 @@
 import plotly.express as px
 import plotly
 import geopandas as gpd
-from IPython.display import IFrame, display_html
-def show_fig(fig, filename, width="100%", height=500):
-    plotly.offline.plot(fig, filename=filename, auto_open=False, auto_play=False)
-    display_html(IFrame(filename, height=height, width=width))
+from figexport import show_fig
 
 dat = px.data.election()
 dat.head()
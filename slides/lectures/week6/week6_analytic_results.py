@@ -33,7 +33,6 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import plotly
 import plotly.express as px
 import altair as alt
 
@@ -41,13 +40,9 @@ import statsmodels.api as sm
 import statsmodels.formula.api as smf
 import sklearn as sk
 
-from IPython.display import IFrame, display_html
-def show_fig(fig, filename, width="100%", height=500):
-    plotly.offline.plot(fig, filename=filename, auto_open=False, auto_play=False)
-    display_html(IFrame(filename, height=height, width=width))
-
-def show_fig2(filename, width="100%", height=500):
-    display_html(IFrame(filename, width=width, height=height))
+from figexport import install, show_fig, show_fig2
+install()  # leave unchanged figures untouched
+alt.data_transformers.enable('preaggregate')  # aggregate in pandas, embed only the result
 
 
 # %% [markdown]
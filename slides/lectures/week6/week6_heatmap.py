@@ -22,20 +22,15 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import altair as alt
-import plotly
 import plotly.express as px
 import os
 
 if not os.path.exists('img'):
     os.makedirs('img')
 
-from IPython.display import IFrame, display_html, HTML
-def show_fig(fig, filename, width="100%", height=500):
-    plotly.offline.plot(fig, filename=filename, auto_open=False, auto_play=False)
-    display_html(IFrame(filename, height=height, width=width))
-
-def show_fig2(filename, width="100%", height=500):
-    display_html(IFrame(filename, width=width, height=height))
+from figexport import install, show_fig, show_fig2
+install()  # leave unchanged figures untouched
+alt.data_transformers.enable('preaggregate')  # aggregate in pandas, embed only the result
 
 
 # %% [markdown]